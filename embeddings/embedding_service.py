@@ -6,6 +6,7 @@ import json
 import os
 import uvicorn
 from typing import List, Optional
+from scheduler import EmbeddingScheduler, QueueFullError
 
 app = FastAPI(title="Configurable Embeddings Service",
               description="API for generating embeddings with configurable models")
@@ -49,6 +50,8 @@ class EmbeddingRequest(BaseModel):
     texts: List[str]
     task: str = config["model"]["default_task"]
     dimensions: Optional[int] = None
+    # "interactive" (search) or "bulk" (ingestion); inferred from task and size when omitted
+    priority: Optional[str] = None
 
 
 # Load the configured model
@@ -70,6 +73,50 @@ except Exception as e:
     raise e
 
 
+def encode_texts(texts: List[str], task: str):
+    """Run a single model forward pass (called from the scheduler thread)"""
+    # Generate embeddings with different parameters based on model capabilities
+    if supports_task:
+        embeddings = model.encode(
+            texts,
+            task=task,
+            prompt_name=task,
+            normalize_embeddings=True,
+            output_value="sentence_embedding",
+            precision="float32",
+            convert_to_numpy=True
+        )
+    else:
+        # For models that don't support task parameter (like all-MiniLM-L6-v2)
+        embeddings = model.encode(
+            texts,
+            normalize_embeddings=True,
+            convert_to_numpy=True
+        )
+
+    # Convert embeddings to list for JSON serialization
+    return embeddings.tolist()
+
+
+# Priority lanes: interactive requests preempt bulk batches between forward passes
+scheduling = config.get("scheduling", {})
+scheduler = EmbeddingScheduler(
+    encode_texts,
+    interactive_max_texts=scheduling.get("interactive_max_texts", 8),
+    interactive_max_batch=scheduling.get("interactive_max_batch", 32),
+    interactive_max_queue=scheduling.get("interactive_max_queue", 256),
+    bulk_max_queue=scheduling.get("bulk_max_queue", 16),
+    bulk_max_concurrency=scheduling.get("bulk_max_concurrency", 2),
+    bulk_micro_batch_size=scheduling.get("bulk_micro_batch_size", 16),
+    bulk_max_texts_per_second=scheduling.get("bulk_max_texts_per_second", 0)
+)
+
+
+@app.on_event("startup")
+async def start_scheduler():
+    scheduler.start()
+
+
 @app.post("/embed")
 async def generate_embeddings(request: EmbeddingRequest):
     try:
@@ -80,27 +127,7 @@ async def generate_embeddings(request: EmbeddingRequest):
         if not texts:
             raise HTTPException(status_code=400, detail="No texts provided")
 
-        # Generate embeddings with different parameters based on model capabilities
-        if supports_task:
-            embeddings = model.encode(
-                texts,
-                task=task,
-                prompt_name=task,
-                normalize_embeddings=True,
-                output_value="sentence_embedding",
-                precision="float32",
-                convert_to_numpy=True
-            )
-        else:
-            # For models that don't support task parameter (like all-MiniLM-L6-v2)
-            embeddings = model.encode(
-                texts,
-                normalize_embeddings=True,
-                convert_to_numpy=True
-            )
-
-        # Convert embeddings to list for JSON serialization
-        embeddings_list = embeddings.tolist()
+        embeddings_list = await scheduler.submit(texts, task, request.priority)
 
         return {
             "embeddings": embeddings_list,
@@ -110,6 +137,12 @@ async def generate_embeddings(request: EmbeddingRequest):
             "input_texts": texts
         }
 
+    except HTTPException:
+        raise
+    except QueueFullError as e:
+        # Clients should retry later (the loader backs off automatically)
+        raise HTTPException(status_code=503, detail=str(e),
+                            headers={"Retry-After": "1"})
     except Exception as e:
         logger.error(f"Error generating embeddings: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -135,5 +168,12 @@ async def get_model_info():
         "available_models": list(config["models_info"].keys())
     }
 
+
+@app.get("/metrics")
+async def get_metrics():
+    """Queue depth and wait time per priority lane"""
+    return scheduler.metrics()
+
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=5000)
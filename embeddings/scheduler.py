@@ -0,0 +1,231 @@
+import asyncio
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+
+# Number of recent wait samples kept for percentiles
+WAIT_SAMPLES = 1000
+
+
+class QueueFullError(Exception):
+    """Lane queue is full, request rejected by admission control"""
+
+
+class EmbeddingJob:
+    """Embedding request waiting in the scheduler"""
+
+    def __init__(self, texts: List[str], task: str, lane: str):
+        self.texts = texts
+        self.task = task
+        self.lane = lane
+        self.cursor = 0
+        self.results: List[list] = []
+        self.enqueued_at = time.monotonic()
+        self.started_at: Optional[float] = None
+        self.future = asyncio.get_running_loop().create_future()
+
+
+class LaneStats:
+    """Per-lane metrics: queue depth and wait time until the first forward pass"""
+
+    def __init__(self):
+        self.requests = 0
+        self.rejected = 0
+        self.texts = 0
+        self.waits = deque(maxlen=WAIT_SAMPLES)
+
+    def record_wait(self, wait: float):
+        self.waits.append(wait)
+
+    def snapshot(self, queue_depth: int, active: int) -> dict:
+        waits = sorted(self.waits)
+        return {
+            "queue_depth": queue_depth,
+            "active": active,
+            "requests": self.requests,
+            "rejected": self.rejected,
+            "texts": self.texts,
+            "wait_avg_ms": round(sum(waits) / len(waits) * 1000, 2) if waits else 0.0,
+            "wait_p95_ms": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))] * 1000, 2) if waits else 0.0,
+            "wait_max_ms": round(waits[-1] * 1000, 2) if waits else 0.0
+        }
+
+
+class EmbeddingScheduler:
+    """Schedules model forward passes across two priority lanes.
+
+    The model runs in a single worker thread. Interactive requests (search
+    queries) are always served first and coalesced into one pass; bulk
+    requests (ingestion) are split into micro-batches, so an interactive
+    request waits for at most one micro-batch. The bulk lane is capped by
+    the number of concurrently processed requests and by texts per second.
+    """
+
+    def __init__(self, encode: Callable[[List[str], str], list], interactive_max_texts: int = 8,
+                 interactive_max_batch: int = 32, interactive_max_queue: int = 256, bulk_max_queue: int = 16,
+                 bulk_max_concurrency: int = 2, bulk_micro_batch_size: int = 16,
+                 bulk_max_texts_per_second: float = 0):
+        self.encode = encode
+        self.interactive_max_texts = interactive_max_texts
+        self.interactive_max_batch = max(
+            interactive_max_texts, interactive_max_batch)
+        self.interactive_max_queue = interactive_max_queue
+        self.bulk_max_queue = bulk_max_queue
+        self.bulk_max_concurrency = max(1, bulk_max_concurrency)
+        self.bulk_micro_batch_size = max(1, bulk_micro_batch_size)
+        self.bulk_max_texts_per_second = bulk_max_texts_per_second
+
+        self.interactive_queue: deque = deque()
+        self.bulk_queue: deque = deque()
+        # Bulk requests being processed round-robin, one micro-batch at a time
+        self.bulk_active: deque = deque()
+        self.stats = {INTERACTIVE: LaneStats(), BULK: LaneStats()}
+
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._wakeup: Optional[asyncio.Event] = None
+        self._bulk_next_at = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start the scheduler loop on the running event loop"""
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def classify(self, texts: List[str], task: str, priority: Optional[str] = None) -> str:
+        """Pick a lane: explicit priority, otherwise query task or small request"""
+        if priority in (INTERACTIVE, BULK):
+            lane = priority
+        else:
+            lane = INTERACTIVE if task == "retrieval.query" or len(
+                texts) <= self.interactive_max_texts else BULK
+        # Large requests never occupy the interactive lane
+        if lane == INTERACTIVE and len(texts) > self.interactive_max_texts:
+            lane = BULK
+        return lane
+
+    async def submit(self, texts: List[str], task: str, priority: Optional[str] = None) -> list:
+        """Enqueue a request and wait for its embeddings"""
+        lane = self.classify(texts, task, priority)
+        stats = self.stats[lane]
+        if lane == INTERACTIVE:
+            queue, limit = self.interactive_queue, self.interactive_max_queue
+        else:
+            queue, limit = self.bulk_queue, self.bulk_max_queue
+        if len(queue) >= limit:
+            stats.rejected += 1
+            raise QueueFullError(f"{lane} queue is full ({limit} requests)")
+
+        job = EmbeddingJob(texts, task, lane)
+        stats.requests += 1
+        stats.texts += len(texts)
+        queue.append(job)
+        self._wakeup.set()
+        return await job.future
+
+    def metrics(self) -> dict:
+        """Metrics per lane"""
+        return {
+            INTERACTIVE: self.stats[INTERACTIVE].snapshot(len(self.interactive_queue), 0),
+            BULK: self.stats[BULK].snapshot(len(self.bulk_queue), len(self.bulk_active))
+        }
+
+    def _start_job(self, job: EmbeddingJob):
+        if job.started_at is None:
+            job.started_at = time.monotonic()
+            self.stats[job.lane].record_wait(
+                job.started_at - job.enqueued_at)
+
+    async def _encode(self, texts: List[str], task: str) -> list:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.encode, texts, task)
+
+    async def _run_interactive(self):
+        """One forward pass for all waiting interactive requests with the same task"""
+        task = self.interactive_queue[0].task
+        jobs, texts = [], []
+        for job in list(self.interactive_queue):
+            if job.task != task:
+                continue
+            if len(texts) + len(job.texts) > self.interactive_max_batch:
+                break
+            jobs.append(job)
+            texts.extend(job.texts)
+        for job in jobs:
+            self.interactive_queue.remove(job)
+            self._start_job(job)
+
+        try:
+            embeddings = await self._encode(texts, task)
+        except Exception as e:
+            for job in jobs:
+                if not job.future.done():
+                    job.future.set_exception(e)
+            return
+
+        offset = 0
+        for job in jobs:
+            if not job.future.done():
+                job.future.set_result(
+                    embeddings[offset:offset + len(job.texts)])
+            offset += len(job.texts)
+
+    async def _run_bulk(self):
+        """One micro-batch of the next active bulk request"""
+        job = self.bulk_active.popleft()
+        self._start_job(job)
+        chunk = job.texts[job.cursor:job.cursor + self.bulk_micro_batch_size]
+
+        try:
+            embeddings = await self._encode(chunk, job.task)
+        except Exception as e:
+            if not job.future.done():
+                job.future.set_exception(e)
+            return
+
+        job.results.extend(embeddings)
+        job.cursor += len(chunk)
+        if self.bulk_max_texts_per_second > 0:
+            self._bulk_next_at = time.monotonic() + len(chunk) / \
+                self.bulk_max_texts_per_second
+
+        if job.cursor >= len(job.texts):
+            if not job.future.done():
+                job.future.set_result(job.results)
+        elif not job.future.done():
+            self.bulk_active.append(job)
+
+    async def _run(self):
+        while True:
+            # Drop requests cancelled by the client
+            for queue in (self.interactive_queue, self.bulk_queue, self.bulk_active):
+                for job in [job for job in queue if job.future.done()]:
+                    queue.remove(job)
+
+            while self.bulk_queue and len(self.bulk_active) < self.bulk_max_concurrency:
+                self.bulk_active.append(self.bulk_queue.popleft())
+
+            if self.interactive_queue:
+                await self._run_interactive()
+                continue
+
+            if self.bulk_active:
+                delay = self._bulk_next_at - time.monotonic()
+                if delay <= 0:
+                    await self._run_bulk()
+                    continue
+                # Bulk throughput cap: wait, but wake up for interactive requests
+                await self._wait(delay)
+                continue
+
+            await self._wait(None)
+
+    async def _wait(self, timeout: Optional[float]):
+        self._wakeup.clear()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
@@ -0,0 +1,124 @@
+# Версии коллекций Qdrant, алиасы и манифест сборки (без зависимостей от Streamlit)
+import time
+import uuid
+from qdrant_client.models import (
+    CollectionStatus, CreateAlias, CreateAliasOperation, DeleteAlias,
+    DeleteAliasOperation, PointStruct
+)
+from config import COLLECTION_VERSION_SEPARATOR, KEEP_COLLECTION_VERSIONS, COLLECTION_READY_TIMEOUT
+
+# Манифест сборки хранится в коллекции точкой без векторов (не участвует в поиске)
+# и поэтому попадает в снапшот вместе с данными
+MANIFEST_POINT_ID = str(uuid.uuid5(uuid.NAMESPACE_URL, "1c-rag/manifest"))
+
+
+class CollectionVersionError(Exception):
+    """Версия коллекции не может быть назначена алиасу"""
+
+
+def new_version_name(alias_name):
+    """Имя новой версии коллекции"""
+    return f"{alias_name}{COLLECTION_VERSION_SEPARATOR}{time.strftime('%Y%m%d%H%M%S')}"
+
+
+def get_alias_target(client, alias_name):
+    """Коллекция, на которую указывает алиас, или None"""
+    for alias in client.get_aliases().aliases:
+        if alias.alias_name == alias_name:
+            return alias.collection_name
+    return None
+
+
+def resolve_collection_name(client, collection_name):
+    """Имя коллекции с учётом алиасов"""
+    return get_alias_target(client, collection_name) or collection_name
+
+
+def list_collection_versions(client, alias_name, finished_only=False):
+    """Версии коллекции (от старых к новым); finished_only — только завершённые сборки"""
+    prefix = f"{alias_name}{COLLECTION_VERSION_SEPARATOR}"
+    versions = sorted(
+        collection.name for collection in client.get_collections().collections
+        if collection.name.startswith(prefix)
+    )
+    if finished_only:
+        versions = [
+            version for version in versions if is_finished_version(client, version)]
+    return versions
+
+
+def is_finished_version(client, collection_name):
+    """Сборка версии завершена: манифест записывается последним шагом загрузки"""
+    try:
+        return read_manifest(client, collection_name) is not None
+    except Exception:
+        # Версия могла быть удалена неудавшейся сборкой между получением списка и проверкой
+        return False
+
+
+def is_legacy_collection(client, alias_name):
+    """Имя алиаса занято коллекцией со старой схемой (без версий)"""
+    return get_alias_target(client, alias_name) is None and client.collection_exists(alias_name)
+
+
+def wait_for_collection_ready(client, collection_name, timeout=COLLECTION_READY_TIMEOUT):
+    """Ожидание завершения индексации и оптимизации коллекции"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if client.get_collection(collection_name).status == CollectionStatus.GREEN:
+            return True
+        time.sleep(2)
+    return False
+
+
+def switch_collection_alias(client, alias_name, collection_name):
+    """Атомарное переключение алиаса на указанную версию коллекции"""
+    # Недостроенную версию удалит её сборка при ошибке — вместе с ней Qdrant удалит и алиас
+    if not is_finished_version(client, collection_name):
+        raise CollectionVersionError(
+            f"Версия {collection_name} не завершена (нет манифеста сборки), переключение отменено")
+
+    operations = []
+    if get_alias_target(client, alias_name) is not None:
+        operations.append(DeleteAliasOperation(
+            delete_alias=DeleteAlias(alias_name=alias_name)))
+    elif client.collection_exists(alias_name):
+        # Коллекция со старой схемой занимает имя алиаса — удаляем её
+        client.delete_collection(alias_name)
+
+    # Удаление и создание алиаса в одной операции — поиск не видит промежуточного состояния
+    operations.append(CreateAliasOperation(create_alias=CreateAlias(
+        collection_name=collection_name, alias_name=alias_name)))
+    client.update_collection_aliases(change_aliases_operations=operations)
+
+
+def cleanup_collection_versions(client, alias_name):
+    """Удаление старых версий коллекции сверх KEEP_COLLECTION_VERSIONS, возвращает удалённые"""
+    current = get_alias_target(client, alias_name)
+    versions = [version for version in list_collection_versions(
+        client, alias_name) if version != current]
+    # Текущая версия тоже учитывается в лимите
+    removed = versions[:max(0, len(versions) - (KEEP_COLLECTION_VERSIONS - 1))]
+    for version in removed:
+        client.delete_collection(version)
+    return removed
+
+
+def write_manifest(client, collection_name, manifest):
+    """Запись манифеста сборки (модель, размерность, хэш источника) в коллекцию"""
+    client.upsert(
+        collection_name=collection_name,
+        points=[PointStruct(id=MANIFEST_POINT_ID, vector={},
+                            payload={"point_type": "manifest", **manifest})]
+    )
+
+
+def read_manifest(client, collection_name):
+    """Чтение манифеста сборки из коллекции, None если его нет"""
+    points = client.retrieve(collection_name=collection_name,
+                             ids=[MANIFEST_POINT_ID], with_payload=True)
+    if not points:
+        return None
+    manifest = dict(points[0].payload)
+    manifest.pop("point_type", None)
+    return manifest
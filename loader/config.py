@@ -11,7 +11,47 @@ QDRANT_PORT = int(os.getenv("QDRANT_PORT", "6333"))
 COLLECTION_NAME = os.getenv("COLLECTION_NAME", "1c_rag")
 
 # Параметры батчинга
-# Обрабатывать строки CSV пачками по 250
+# Минимальный батч строк CSV (растёт до окна адаптивного клиента эмбеддингов)
 ROW_BATCH_SIZE = int(os.getenv("ROW_BATCH_SIZE", "250"))
-# Размер батча для эмбеддингов
+# Начальный размер батча для эмбеддингов (далее подстраивается адаптивно)
 EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "50"))
+
+# Адаптивный клиент сервиса эмбеддингов
+# Границы размера батча
+EMBEDDING_MIN_BATCH_SIZE = int(os.getenv("EMBEDDING_MIN_BATCH_SIZE", "1"))
+EMBEDDING_MAX_BATCH_SIZE = int(os.getenv("EMBEDDING_MAX_BATCH_SIZE", "256"))
+# Максимальное количество одновременных запросов к сервису
+EMBEDDING_MAX_CONCURRENCY = int(os.getenv("EMBEDDING_MAX_CONCURRENCY", "4"))
+# Целевая задержка одного запроса, секунд: выше — батч уменьшается
+EMBEDDING_TARGET_LATENCY = float(os.getenv("EMBEDDING_TARGET_LATENCY", "5.0"))
+# Таймаут запроса и повторные попытки
+EMBEDDING_REQUEST_TIMEOUT = int(os.getenv("EMBEDDING_REQUEST_TIMEOUT", "120"))
+EMBEDDING_MAX_RETRIES = int(os.getenv("EMBEDDING_MAX_RETRIES", "3"))
+EMBEDDING_RETRY_BACKOFF = float(os.getenv("EMBEDDING_RETRY_BACKOFF", "1.0"))
+
+# Режим индексации: object — один документ на объект, sections — дополнительно
+# разбивать markdown на разделы (реквизиты, табличные части, формы и т.д.)
+CHUNKING_MODE = os.getenv("CHUNKING_MODE", "object")
+# Максимальный размер раздела в символах, более крупные разделы делятся на части
+SECTION_MAX_CHARS = int(os.getenv("SECTION_MAX_CHARS", "4000"))
+# Имя вектора содержимого разделов в коллекции Qdrant
+CONTENT_VECTOR = "content"
+
+# Перезагрузка без простоя: данные загружаются в версию коллекции
+# <имя>__v<дата-время>, затем алиас <имя> атомарно переключается на неё
+COLLECTION_VERSION_SEPARATOR = "__v"
+# Сколько версий хранить для отката (текущая + предыдущие, не меньше 2)
+KEEP_COLLECTION_VERSIONS = max(2, int(os.getenv("KEEP_COLLECTION_VERSIONS", "2")))
+# Сколько ждать завершения оптимизации новой версии перед переключением, секунд
+COLLECTION_READY_TIMEOUT = int(os.getenv("COLLECTION_READY_TIMEOUT", "600"))
+
+# Куда записывать результат: qdrant, local (локальный индекс для MCP без Qdrant) или both
+STORAGE_TARGET = os.getenv("STORAGE_TARGET", "qdrant")
+# Каталог локальных индексов (общий с MCP сервером)
+LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", "local_index")
+# Формат векторов локального индекса: float32 или int8 (в 4 раза меньше, точность чуть ниже)
+LOCAL_INDEX_DTYPE = os.getenv("LOCAL_INDEX_DTYPE", "float32")
+# С какого количества объектов строить IVF (0 — всегда полный перебор)
+LOCAL_INDEX_IVF_MIN_POINTS = int(os.getenv("LOCAL_INDEX_IVF_MIN_POINTS", "50000"))
+# Итерации k-means при обучении центроидов IVF
+LOCAL_INDEX_IVF_ITERATIONS = int(os.getenv("LOCAL_INDEX_IVF_ITERATIONS", "10"))
@@ -0,0 +1,178 @@
+# Адаптивный клиент сервиса эмбеддингов для loader
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import (
+    EMBEDDING_SERVICE_URL, EMBEDDING_BATCH_SIZE, EMBEDDING_MIN_BATCH_SIZE,
+    EMBEDDING_MAX_BATCH_SIZE, EMBEDDING_MAX_CONCURRENCY, EMBEDDING_TARGET_LATENCY,
+    EMBEDDING_REQUEST_TIMEOUT, EMBEDDING_MAX_RETRIES, EMBEDDING_RETRY_BACKOFF
+)
+
+# Коды ответа, при которых запрос имеет смысл повторить (в том числе меньшим батчем)
+RETRYABLE_STATUS_CODES = {408, 413, 429, 500, 502, 503, 504}
+
+
+class EmbeddingServiceError(Exception):
+    """Ошибка сервиса эмбеддингов, которую не удалось устранить повторами"""
+
+
+class AdaptiveEmbeddingClient:
+    """Клиент сервиса эмбеддингов с адаптивным размером батча и числом параллельных запросов.
+
+    Размер батча и количество запросов в полёте подбираются по схеме AIMD:
+    при задержке в пределах цели растут аддитивно, при превышении задержки
+    или ошибке уменьшаются мультипликативно. Неудачный батч делится пополам
+    и отправляется повторно с экспоненциальной паузой.
+    """
+
+    def __init__(self, service_url=EMBEDDING_SERVICE_URL, task="retrieval.passage",
+                 batch_size=EMBEDDING_BATCH_SIZE, min_batch_size=EMBEDDING_MIN_BATCH_SIZE,
+                 max_batch_size=EMBEDDING_MAX_BATCH_SIZE, max_concurrency=EMBEDDING_MAX_CONCURRENCY,
+                 target_latency=EMBEDDING_TARGET_LATENCY, timeout=EMBEDDING_REQUEST_TIMEOUT,
+                 max_retries=EMBEDDING_MAX_RETRIES, retry_backoff=EMBEDDING_RETRY_BACKOFF):
+        self.service_url = service_url
+        self.task = task
+        self.min_batch_size = max(1, min_batch_size)
+        self.max_batch_size = max(self.min_batch_size, max_batch_size)
+        self.batch_size = min(max(batch_size, self.min_batch_size),
+                              self.max_batch_size)
+        self.batch_step = max(1, batch_size // 5)
+        self.max_concurrency = max(1, max_concurrency)
+        self.concurrency = 1
+        self.target_latency = target_latency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+
+        # Статистика для отображения прогресса
+        self.requests_total = 0
+        self.errors_total = 0
+        self.throughput = 0.0
+
+        self._successes = 0
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=self.max_concurrency)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+
+    def _post(self, texts):
+        """Один запрос к сервису: (эмбеддинги или None, задержка, описание ошибки, можно ли повторить)"""
+        started = time.monotonic()
+        try:
+            response = self._session.post(
+                f"{self.service_url}/embed",
+                json={"texts": texts, "task": self.task, "priority": "bulk"},
+                timeout=self.timeout
+            )
+        except requests.RequestException as e:
+            return None, time.monotonic() - started, str(e), True
+
+        latency = time.monotonic() - started
+        if response.status_code != 200:
+            return (None, latency, f"HTTP {response.status_code}",
+                    response.status_code in RETRYABLE_STATUS_CODES)
+
+        # Повреждённый или неполный ответ повторяется, иначе векторы сдвинутся на чужие объекты
+        try:
+            embeddings = response.json()["embeddings"]
+        except (ValueError, KeyError, TypeError) as e:
+            return None, latency, f"некорректный ответ сервиса: {e}", True
+        if not isinstance(embeddings, list) or len(embeddings) != len(texts):
+            received = len(embeddings) if isinstance(embeddings, list) else 0
+            return (None, latency,
+                    f"получено {received} эмбеддингов вместо {len(texts)}", True)
+        return embeddings, latency, None, False
+
+    def _on_success(self, latency, size):
+        """Аддитивное увеличение при задержке в пределах цели, уменьшение при превышении"""
+        if size:
+            self.throughput = size / latency if latency > 0 else self.throughput
+        if latency > self.target_latency:
+            self._successes = 0
+            self.batch_size = max(self.min_batch_size,
+                                  int(self.batch_size * 0.75))
+            self.concurrency = max(1, self.concurrency - 1)
+            return
+
+        # Батч растёт только если сервис обработал батч полного размера
+        if size >= self.batch_size:
+            self.batch_size = min(self.max_batch_size,
+                                  self.batch_size + self.batch_step)
+        self._successes += 1
+        if self._successes >= self.concurrency:
+            self._successes = 0
+            self.concurrency = min(self.max_concurrency, self.concurrency + 1)
+
+    def _on_failure(self):
+        """Мультипликативное уменьшение батча и параллелизма при ошибке"""
+        self.errors_total += 1
+        self._successes = 0
+        self.batch_size = max(self.min_batch_size, self.batch_size // 2)
+        self.concurrency = max(1, self.concurrency // 2)
+
+    def embed(self, texts, progress_callback=None):
+        """Генерация эмбеддингов для списка текстов с сохранением порядка"""
+        results = [None] * len(texts)
+        done_count = 0
+        cursor = 0
+        # Повторные отправки: (начало, конец, попытка, не раньше чем)
+        retries = deque()
+        in_flight = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            while cursor < len(texts) or retries or in_flight:
+                # Заполняем окно запросов до текущего уровня параллелизма
+                while len(in_flight) < self.concurrency:
+                    if retries and retries[0][3] <= time.monotonic():
+                        start, end, attempt, _ = retries.popleft()
+                    elif cursor < len(texts):
+                        start = cursor
+                        end = min(cursor + self.batch_size, len(texts))
+                        cursor, attempt = end, 0
+                    else:
+                        break
+                    future = executor.submit(self._post, texts[start:end])
+                    in_flight[future] = (start, end, attempt)
+                    self.requests_total += 1
+
+                if not in_flight:
+                    # Ждём окончания паузы перед повтором
+                    time.sleep(max(0.0, retries[0][3] - time.monotonic()))
+                    continue
+
+                finished, _ = wait(
+                    in_flight, timeout=self.retry_backoff, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    start, end, attempt = in_flight.pop(future)
+                    embeddings, latency, error, retryable = future.result()
+
+                    if embeddings is not None:
+                        results[start:end] = embeddings
+                        done_count += end - start
+                        self._on_success(latency, end - start)
+                        if progress_callback:
+                            progress_callback(done_count, len(texts))
+                        continue
+
+                    self._on_failure()
+                    if not retryable:
+                        raise EmbeddingServiceError(
+                            f"Ошибка генерации эмбеддингов: {error}")
+                    if attempt >= self.max_retries:
+                        raise EmbeddingServiceError(
+                            f"Ошибка генерации эмбеддингов после {attempt + 1} попыток: {error}")
+
+                    ready_at = time.monotonic() + self.retry_backoff * (2 ** attempt)
+                    if end - start > 1:
+                        # Делим неудачный батч пополам и повторяем обе части
+                        middle = (start + end) // 2
+                        retries.append((start, middle, attempt + 1, ready_at))
+                        retries.append((middle, end, attempt + 1, ready_at))
+                    else:
+                        retries.append((start, end, attempt + 1, ready_at))
+
+        return results
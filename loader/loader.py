@@ -4,14 +4,26 @@ import pandas as pd
 from qdrant_client import QdrantClient
 from qdrant_client.models import Distance, VectorParams, PointStruct
 from pathlib import Path
-import time
 import streamlit as st
 import zipfile
 import tempfile
 import shutil
 import requests
 import json
-from config import EMBEDDING_SERVICE_URL, COLLECTION_NAME, ROW_BATCH_SIZE, EMBEDDING_BATCH_SIZE, QDRANT_HOST, QDRANT_PORT
+import re
+import hashlib
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from qdrant_client.models import PayloadSchemaType
+from config import EMBEDDING_SERVICE_URL, COLLECTION_NAME, ROW_BATCH_SIZE, QDRANT_HOST, QDRANT_PORT
+from config import CHUNKING_MODE, SECTION_MAX_CHARS, CONTENT_VECTOR, STORAGE_TARGET, LOCAL_INDEX_DIR
+from local_index import LocalIndexWriter
+from collection_store import (
+    new_version_name, get_alias_target, list_collection_versions, is_legacy_collection,
+    wait_for_collection_ready, switch_collection_alias, cleanup_collection_versions,
+    write_manifest, CollectionVersionError
+)
+from embedding_client import AdaptiveEmbeddingClient, EmbeddingServiceError
 
 
 # Инициализация клиента Qdrant (кэширование в Streamlit)
@@ -35,29 +47,10 @@ def get_embedding_service_info():
         return None
 
 
-def generate_embeddings_via_service(texts):
-    """Генерация эмбеддингов через внешний сервис"""
-    try:
-        payload = {
-            "texts": texts,
-            "task": "retrieval.passage"
-        }
-
-        response = requests.post(
-            f"{EMBEDDING_SERVICE_URL}/embed",
-            json=payload,
-            headers={"Content-Type": "application/json"}
-        )
-
-        if response.status_code == 200:
-            result = response.json()
-            return result["embeddings"]
-        else:
-            st.error(f"Ошибка генерации эмбеддингов: {response.status_code}")
-            return None
-    except Exception as e:
-        st.error(f"Ошибка подключения к сервису эмбеддингов: {e}")
-        return None
+@st.cache_resource
+def get_embedding_client():
+    """Адаптивный клиент сервиса эмбеддингов (кэшируется, чтобы подобранные параметры сохранялись между батчами)"""
+    return AdaptiveEmbeddingClient()
 
 
 def extract_zip_to_temp(zip_file):
@@ -81,6 +74,31 @@ def load_markdown_content(file_path, base_path):
         return ""
 
 
+# Ссылочные типы в описании реквизитов: СправочникСсылка.Номенклатура -> Справочник.Номенклатура
+REFERENCE_TYPE_PATTERN = re.compile(
+    r"(Справочник|Документ|Перечисление|ПланВидовХарактеристик|ПланСчетов|ПланВидовРасчета|"
+    r"ПланОбмена|БизнесПроцесс|Задача)Ссылка\.([\wЁё]+)")
+# Упоминания регистров (движения документов, связанные регистры)
+REGISTER_PATTERN = re.compile(
+    r"(РегистрСведений|РегистрНакопления|РегистрБухгалтерии|РегистрРасчета)\.([\wЁё]+)")
+
+
+def get_object_key(object_name, object_type):
+    """Ключ объекта в графе ссылок вида Тип.Имя"""
+    return object_name if "." in object_name else f"{object_type}.{object_name}"
+
+
+def extract_references(doc, object_key):
+    """Объекты, на которые ссылается описание объекта (ключи Тип.Имя без повторов)"""
+    references = []
+    for pattern in (REFERENCE_TYPE_PATTERN, REGISTER_PATTERN):
+        for match in pattern.finditer(doc):
+            key = f"{match.group(1)}.{match.group(2)}"
+            if key != object_key and key not in references:
+                references.append(key)
+    return references
+
+
 def process_csv_batch(csv_rows, base_path):
     """Обработка батча строк CSV с созданием двух векторов на объект"""
     object_name_texts = []
@@ -95,11 +113,15 @@ def process_csv_batch(csv_rows, base_path):
 
         # Загружаем содержимое markdown файла
         doc = load_markdown_content(file_name, base_path)
+        object_key = get_object_key(object_name, object_type)
         metadata = {
             "object_name": object_name,
             "object_type": object_type,
             "doc": doc,
-            "file_name": file_name
+            "file_name": file_name,
+            # Граф ссылок между объектами хранится вместе с коллекцией
+            "object_key": object_key,
+            "references": extract_references(doc, object_key)
         }
 
         # Создаем два типа текстов для векторизации:
@@ -116,38 +138,117 @@ def process_csv_batch(csv_rows, base_path):
     return object_name_texts, friendly_name_texts, metadatas
 
 
-def generate_embeddings_batch(texts, batch_info_text, embedding_progress_bar):
-    """Генерация эмбеддингов батчами через внешний сервис"""
-    all_embeddings = []
+def split_markdown_sections(doc):
+    """Разбиение markdown объекта на разделы по заголовкам второго и более глубокого уровня"""
+    sections = []
+    title = None
+    level = 0
+    headings = []
+    lines = []
+
+    def flush():
+        text = "\n".join(headings + lines).strip()
+        if text:
+            sections.append((title or "Общие сведения", text))
+
+    for line in doc.splitlines():
+        match = re.match(r"^(#{1,6})\s+(.*)$", line)
+        if match and len(match.group(1)) >= 2:
+            new_level = len(match.group(1))
+            new_title = match.group(2).strip()
+            if title is not None and not "\n".join(lines).strip():
+                # Заголовок без текста не становится разделом: вложенный заголовок
+                # наследует его название ("Табличные части / Товары"), соседний — отбрасывает
+                if new_level > level:
+                    title = f"{title} / {new_title}"
+                    level = new_level
+                    headings.append(line)
+                    lines = []
+                    continue
+            else:
+                flush()
+            title, level = new_title, new_level
+            headings, lines = [line], []
+        else:
+            lines.append(line)
+    if title is None or "\n".join(lines).strip():
+        flush()
+
+    # Крупные разделы (длинные списки реквизитов) делим на части по строкам
+    result = []
+    for title, text in sections:
+        if len(text) <= SECTION_MAX_CHARS:
+            result.append((title, text))
+            continue
+        part, size, part_num = [], 0, 1
+        for line in text.splitlines():
+            if part and size + len(line) + 1 > SECTION_MAX_CHARS:
+                result.append((f"{title} ({part_num})", "\n".join(part)))
+                part, size, part_num = [], 0, part_num + 1
+            part.append(line)
+            size += len(line) + 1
+        if part:
+            result.append((f"{title} ({part_num})" if part_num > 1 else title,
+                           "\n".join(part)))
+    return result
+
+
+def build_sections(metadatas, parent_ids):
+    """Подготовка разделов объектов для загрузки дочерними точками"""
+    section_texts = []
+    section_metadatas = []
+
+    for metadata, parent_id in zip(metadatas, parent_ids):
+        sections = split_markdown_sections(metadata["doc"])
+        for index, (title, text) in enumerate(sections):
+            # В текст для векторизации добавляем объект, чтобы раздел не терял контекст
+            section_texts.append(
+                f"{metadata['object_type']} {metadata['object_name']}. {title}\n{text}")
+            section_metadatas.append({
+                "point_type": "section",
+                "parent_id": parent_id,
+                "object_name": metadata["object_name"],
+                "object_type": metadata["object_type"],
+                "file_name": metadata["file_name"],
+                "section_title": title,
+                "section_index": index,
+                "doc": text
+            })
+
+        # Родительская точка хранит оглавление вместо полного текста
+        metadata["point_type"] = "object"
+        metadata["parent_id"] = parent_id
+        metadata["sections"] = [title for title, _ in sections]
+        del metadata["doc"]
+
+    return section_texts, section_metadatas
 
-    total_embedding_batches = (
-        len(texts) + EMBEDDING_BATCH_SIZE - 1) // EMBEDDING_BATCH_SIZE
 
-    for i in range(0, len(texts), EMBEDDING_BATCH_SIZE):
-        batch_texts = texts[i:i + EMBEDDING_BATCH_SIZE]
-        current_batch = i // EMBEDDING_BATCH_SIZE + 1
+def generate_embeddings_batch(texts, batch_info_text, embedding_progress_bar):
+    """Генерация эмбеддингов батчами через внешний сервис"""
+    client = get_embedding_client()
 
+    def on_progress(done, total):
         batch_info_text.write(
-            f"Обработано {current_batch} батчей ембеддингов из {total_embedding_batches}")
-        embedding_progress_bar.progress(
-            current_batch / total_embedding_batches)
-
-        # Генерируем эмбеддинги через внешний сервис
-        batch_embeddings = generate_embeddings_via_service(batch_texts)
-        if batch_embeddings is None:
-            st.error("Ошибка генерации эмбеддингов")
-            return None
+            f"Эмбеддинги: {done}/{total} (батч {client.batch_size}, параллельно {client.concurrency}, "
+            f"{client.throughput:.1f} текстов/с, ошибок {client.errors_total})")
+        embedding_progress_bar.progress(done / total)
 
-        all_embeddings.extend(batch_embeddings)
-
-    return all_embeddings
+    try:
+        return client.embed(texts, on_progress)
+    except EmbeddingServiceError as e:
+        st.error(str(e))
+        return None
 
 
-def upload_to_qdrant(object_name_embeddings, friendly_name_embeddings, object_name_texts, friendly_name_texts, metadatas, client, collection_name):
+def upload_to_qdrant(object_name_embeddings, friendly_name_embeddings, object_name_texts, friendly_name_texts, metadatas, client, collection_name, point_ids=None):
     """Загрузка в Qdrant с двумя типами векторов"""
+    if point_ids is None:
+        point_ids = [str(uuid.uuid4()) for _ in metadatas]
+
     points = [
         PointStruct(
-            id=str(uuid.uuid4()),
+            id=point_id,
             vector={
                 "object_name": object_name_embedding,
                 "friendly_name": friendly_name_embedding
@@ -159,8 +260,8 @@ def upload_to_qdrant(object_name_embeddings, friendly_name_embeddings, object_na
                 **metadata
             }
         )
-        for object_name_embedding, friendly_name_embedding, object_name_text, friendly_name_text, metadata in
-        zip(object_name_embeddings, friendly_name_embeddings,
+        for point_id, object_name_embedding, friendly_name_embedding, object_name_text, friendly_name_text, metadata in
+        zip(point_ids, object_name_embeddings, friendly_name_embeddings,
             object_name_texts, friendly_name_texts, metadatas)
     ]
 
@@ -170,9 +271,55 @@ def upload_to_qdrant(object_name_embeddings, friendly_name_embeddings, object_na
     )
 
 
-def process_files(zip_file, collection_name):
+def upload_sections_to_qdrant(section_embeddings, section_metadatas, client, collection_name):
+    """Загрузка разделов объектов в Qdrant дочерними точками с вектором содержимого"""
+    points = [
+        PointStruct(
+            id=str(uuid.uuid4()),
+            vector={CONTENT_VECTOR: section_embedding},
+            payload=section_metadata
+        )
+        for section_embedding, section_metadata in zip(section_embeddings, section_metadatas)
+    ]
+
+    # Разделов в батче строк может быть в разы больше, чем объектов: загружаем частями
+    for start in range(0, len(points), ROW_BATCH_SIZE):
+        client.upsert(
+            collection_name=collection_name,
+            points=points[start:start + ROW_BATCH_SIZE]
+        )
+
+
+def upload_batch_to_qdrant(object_name_embeddings, friendly_name_embeddings, object_name_texts, friendly_name_texts,
+                           metadatas, point_ids, section_embeddings, section_metadatas, client, collection_name):
+    """Загрузка батча объектов и их разделов (выполняется в фоновом потоке, без вызовов Streamlit)"""
+    upload_to_qdrant(object_name_embeddings, friendly_name_embeddings,
+                     object_name_texts, friendly_name_texts, metadatas,
+                     client, collection_name, point_ids)
+    if section_embeddings:
+        upload_sections_to_qdrant(
+            section_embeddings, section_metadatas, client, collection_name)
+
+
+def publish_local_index(local_writer, alias_name):
+    """Переключение ссылки локального индекса на построенную версию"""
+    removed = local_writer.publish()
+    st.write(
+        f"Локальный индекс {LOCAL_INDEX_DIR}/{alias_name} переключён на {local_writer.version_name}.")
+    for version in removed:
+        st.write(f"Удалена устаревшая версия локального индекса {version}.")
+
+
+def process_files(zip_file, collection_name, chunking_mode=CHUNKING_MODE, storage=STORAGE_TARGET):
     """Основная функция обработки файлов"""
     temp_dir = None
+    use_qdrant = storage in ("qdrant", "both")
+    local_writer = None
+    upload_executor = None
+    # Имя из интерфейса становится алиасом, данные загружаются в новую версию коллекции
+    alias_name = collection_name
+    collection_name = None
+    build_completed = False
     try:
         # Извлечение ZIP-архива
         st.write("Извлечение ZIP-архива...")
@@ -193,7 +340,7 @@ def process_files(zip_file, collection_name):
             return False
 
         # Инициализация клиентов
-        client = get_qdrant_client()
+        client = get_qdrant_client() if use_qdrant else None
 
         # Проверяем доступность сервиса эмбеддингов
         st.write("Проверка подключения к сервису эмбеддингов...")
@@ -210,33 +357,47 @@ def process_files(zip_file, collection_name):
         global DIMENSIONS
         DIMENSIONS = embedding_info.get('dimensions', 384)
 
-        # Проверка и пересоздание коллекции
-        if client.collection_exists(collection_name):
-            collection_info = client.get_collection(collection_name)
-            if collection_info.points_count > 0:
-                st.write(
-                    f"Удаление существующей коллекции {collection_name} с {collection_info.points_count} записями...")
-                client.delete_collection(collection_name)
-                st.write("Коллекция удалена.")
+        if storage in ("local", "both"):
+            # Локальный индекс для MCP без Qdrant: только объекты, без разделов
+            local_writer = LocalIndexWriter(alias_name, DIMENSIONS)
+            st.write(f"Запись локального индекса в {local_writer.path}...")
 
-        if not client.collection_exists(collection_name):
+        # Рабочая коллекция (алиас) не затрагивается до переключения на новую версию
+        collection_name = new_version_name(alias_name) if use_qdrant else None
+
+        if use_qdrant and not client.collection_exists(collection_name):
             st.write(
                 f"Создание новой коллекции {collection_name} с поддержкой двух типов векторов...")
+            vectors_config = {
+                "object_name": VectorParams(
+                    size=DIMENSIONS,
+                    distance=Distance.COSINE,
+                    on_disk=True
+                ),
+                "friendly_name": VectorParams(
+                    size=DIMENSIONS,
+                    distance=Distance.COSINE,
+                    on_disk=True
+                )
+            }
+            if chunking_mode == "sections":
+                # Вектор содержимого есть только у разделов (дочерних точек)
+                vectors_config[CONTENT_VECTOR] = VectorParams(
+                    size=DIMENSIONS,
+                    distance=Distance.COSINE,
+                    on_disk=True
+                )
             client.create_collection(
                 collection_name=collection_name,
-                vectors_config={
-                    "object_name": VectorParams(
-                        size=DIMENSIONS,
-                        distance=Distance.COSINE,
-                        on_disk=True
-                    ),
-                    "friendly_name": VectorParams(
-                        size=DIMENSIONS,
-                        distance=Distance.COSINE,
-                        on_disk=True
-                    )
-                }
+                vectors_config=vectors_config
             )
+            if chunking_mode == "sections":
+                # Индекс для группировки разделов по родительскому объекту
+                client.create_payload_index(
+                    collection_name=collection_name,
+                    field_name="parent_id",
+                    field_schema=PayloadSchemaType.KEYWORD
+                )
             st.write("Коллекция создана.")
 
         # Чтение CSV файла
@@ -261,6 +422,7 @@ def process_files(zip_file, collection_name):
 
         total_rows = len(df)
         total_points_processed = 0
+        total_sections_processed = 0
 
         # Создаем общий прогресс-бар для обработки строк CSV
         csv_progress_text = st.empty()
@@ -270,16 +432,27 @@ def process_files(zip_file, collection_name):
         batch_info_text = st.empty()
         embedding_progress = st.progress(0)
 
-        # Обработка строк CSV батчами
-        for i in range(0, total_rows, ROW_BATCH_SIZE):
-            row_batch = df.iloc[i:i + ROW_BATCH_SIZE]
-            current_batch_num = i // ROW_BATCH_SIZE + 1
-            total_batches = (total_rows + ROW_BATCH_SIZE - 1) // ROW_BATCH_SIZE
+        # Загрузка в Qdrant идёт в фоне, пока генерируются эмбеддинги следующего батча строк
+        embedding_client = get_embedding_client()
+        upload_executor = ThreadPoolExecutor(max_workers=1)
+        pending_upload = None
+
+        # Обработка строк CSV батчами: батч строк не меньше окна адаптивного клиента,
+        # иначе параллельным запросам к сервису эмбеддингов нечего отправлять
+        i = 0
+        current_batch_num = 0
+        while i < total_rows:
+            window_texts = embedding_client.batch_size * embedding_client.max_concurrency
+            # На объект приходится два текста (object_name и friendly_name)
+            row_batch_size = max(ROW_BATCH_SIZE, (window_texts + 1) // 2)
+            row_batch = df.iloc[i:i + row_batch_size]
+            i += row_batch_size
+            current_batch_num += 1
 
             # Обновляем общий прогресс
-            rows_processed = min(i + ROW_BATCH_SIZE, total_rows)
+            rows_processed = min(i, total_rows)
             csv_progress_text.write(
-                f"Обработка строк CSV: {rows_processed}/{total_rows} (батч строк {current_batch_num}/{total_batches})")
+                f"Обработка строк CSV: {rows_processed}/{total_rows} (батч строк {current_batch_num}, {len(row_batch)} строк)")
             overall_progress.progress(rows_processed / total_rows)
 
             # Обработка текста
@@ -290,35 +463,96 @@ def process_files(zip_file, collection_name):
                 st.warning("Нет текстов для обработки в этом батче")
                 continue
 
-            # Генерация эмбеддингов для object_name
-            object_name_embeddings = generate_embeddings_batch(
-                object_name_texts, batch_info_text, embedding_progress)
+            # Копия payload до build_sections, который убирает полный текст из объекта
+            local_payloads = [
+                {"friendly_name": friendly_name_text, **metadata}
+                for friendly_name_text, metadata in zip(friendly_name_texts, metadatas)
+            ] if local_writer else None
 
-            if object_name_embeddings is None:
-                st.error(
-                    "Ошибка генерации эмбеддингов для object_name, прерываем обработку")
-                return False
+            point_ids = [str(uuid.uuid4()) for _ in metadatas]
+
+            section_texts, section_metadatas = [], []
+            if use_qdrant and chunking_mode == "sections":
+                # Разбиение на разделы: их содержимое векторизуется вместе с именами объектов
+                section_texts, section_metadatas = build_sections(
+                    metadatas, point_ids)
 
-            # Генерация эмбеддингов для friendly_name
-            friendly_name_embeddings = generate_embeddings_batch(
-                friendly_name_texts, batch_info_text, embedding_progress)
+            # Один вызов на все тексты батча строк: адаптивный клиент распределяет их по параллельным запросам
+            embeddings = generate_embeddings_batch(
+                object_name_texts + friendly_name_texts + section_texts, batch_info_text, embedding_progress)
 
-            if friendly_name_embeddings is None:
+            if embeddings is None:
                 st.error(
-                    "Ошибка генерации эмбеддингов для friendly_name, прерываем обработку")
+                    "Ошибка генерации эмбеддингов, прерываем обработку")
                 return False
 
-            # Загрузка в Qdrant
-            upload_to_qdrant(object_name_embeddings, friendly_name_embeddings,
-                             object_name_texts, friendly_name_texts, metadatas,
-                             client, collection_name)
-
-            total_points_processed += len(object_name_texts)
-
-            time.sleep(1)
+            count = len(object_name_texts)
+            object_name_embeddings = embeddings[:count]
+            friendly_name_embeddings = embeddings[count:2 * count]
+            section_embeddings = embeddings[2 * count:]
+
+            if local_writer:
+                local_writer.add(object_name_embeddings,
+                                 friendly_name_embeddings, local_payloads)
+
+            # Загрузка в Qdrant: ждём предыдущую загрузку, чтобы ошибка не потерялась и память не росла
+            if use_qdrant:
+                if pending_upload is not None:
+                    pending_upload.result()
+                pending_upload = upload_executor.submit(
+                    upload_batch_to_qdrant, object_name_embeddings, friendly_name_embeddings,
+                    object_name_texts, friendly_name_texts, metadatas, point_ids,
+                    section_embeddings, section_metadatas, client, collection_name)
+                total_sections_processed += len(section_embeddings)
+
+            total_points_processed += count
+
+        if pending_upload is not None:
+            pending_upload.result()
+
+        # Манифест сборки: по нему проверяется совместимость при восстановлении из снапшота
+        manifest = {
+            "model_name": embedding_info.get("model_name"),
+            "dimensions": DIMENSIONS,
+            "source_hash": hashlib.sha256(zip_file.getvalue()).hexdigest(),
+            "chunking_mode": chunking_mode,
+            "points_count": total_points_processed,
+            "created_at": datetime.now(timezone.utc).isoformat()
+        }
 
+        if local_writer:
+            # Ссылка переключается только после Qdrant, чтобы при ошибке оба хранилища остались на прежней версии
+            st.write("Построение локального индекса...")
+            local_writer.build(manifest)
+
+        if not use_qdrant:
+            publish_local_index(local_writer, alias_name)
+            st.success(
+                f"Обработка завершена! Всего записано {total_points_processed} объектов в локальный индекс {alias_name}")
+            return True
+
+        st.write(f"Ожидание оптимизации коллекции {collection_name}...")
+        if not wait_for_collection_ready(client, collection_name):
+            st.warning(
+                "Оптимизация не завершилась за отведённое время, коллекция будет переключена без её завершения")
+
+        # Манифест — признак завершённой версии: только такие версии предлагаются для отката
+        write_manifest(client, collection_name, manifest)
+
+        if is_legacy_collection(client, alias_name):
+            st.warning(
+                f"Удаление коллекции {alias_name} без версий, чтобы использовать это имя как алиас...")
+        switch_collection_alias(client, alias_name, collection_name)
+        build_completed = True
+        st.write(f"Алиас {alias_name} переключён на {collection_name}.")
+        if local_writer:
+            publish_local_index(local_writer, alias_name)
+        for version in cleanup_collection_versions(client, alias_name):
+            st.write(f"Удалена устаревшая версия {version}.")
+
+        sections_text = f" и {total_sections_processed} разделов" if chunking_mode == "sections" else ""
         st.success(
-            f"Обработка завершена! Всего загружено {total_points_processed} записей в коллекцию {collection_name}")
+            f"Обработка завершена! Всего загружено {total_points_processed} записей{sections_text} в коллекцию {alias_name} (версия {collection_name})")
         return True
 
     except Exception as e:
@@ -326,6 +560,25 @@ def process_files(zip_file, collection_name):
         return False
 
     finally:
+        # Фоновая загрузка должна завершиться до удаления недостроенной версии
+        if upload_executor:
+            upload_executor.shutdown(wait=True)
+
+        if local_writer and not local_writer.finalized:
+            local_writer.abort()
+
+        # Недостроенная версия не нужна: рабочая коллекция осталась прежней
+        if collection_name and not build_completed:
+            try:
+                client = get_qdrant_client()
+                if client.collection_exists(collection_name):
+                    st.write(
+                        f"Удаление недостроенной версии {collection_name}...")
+                    client.delete_collection(collection_name)
+            except Exception as e:
+                st.warning(
+                    f"Не удалось удалить недостроенную версию {collection_name}: {e}")
+
         # Очистка временных файлов
         if temp_dir and os.path.exists(temp_dir):
             st.write("Очистка временных файлов...")
@@ -349,6 +602,35 @@ def main():
         st.error("Пожалуйста, введите имя коллекции")
         collection_name = COLLECTION_NAME
 
+    # Режим индексации
+    chunking_modes = ["object", "sections"]
+    chunking_mode = st.selectbox(
+        "Режим индексации",
+        chunking_modes,
+        index=chunking_modes.index(
+            CHUNKING_MODE) if CHUNKING_MODE in chunking_modes else 0,
+        format_func=lambda mode: {
+            "object": "Объект целиком",
+            "sections": "Разделы объекта (реквизиты, табличные части, формы)"
+        }[mode],
+        help="В режиме разделов markdown объекта разбивается на разделы, каждый со своим вектором; поиск возвращает только подходящие разделы"
+    )
+
+    # Куда записывать результат
+    storage_targets = ["qdrant", "local", "both"]
+    storage = st.selectbox(
+        "Хранилище",
+        storage_targets,
+        index=storage_targets.index(
+            STORAGE_TARGET) if STORAGE_TARGET in storage_targets else 0,
+        format_func=lambda target: {
+            "qdrant": "Qdrant",
+            "local": "Локальный индекс (MCP без Qdrant)",
+            "both": "Qdrant и локальный индекс"
+        }[target],
+        help="Локальный индекс — матрицы векторов в файлах для встроенного поиска MCP-сервера (SEARCH_BACKEND=local); разделы объектов в него не входят"
+    )
+
     # Загрузка файлов
     zip_file = st.file_uploader(
         "Выберите ZIP архив",
@@ -364,10 +646,36 @@ def main():
             st.error("Пожалуйста, введите имя коллекции")
         else:
             with st.spinner("Обработка файлов..."):
-                success = process_files(zip_file, collection_name.strip())
+                success = process_files(
+                    zip_file, collection_name.strip(), chunking_mode, storage)
                 if success:
                     st.balloons()
 
+    # Версии коллекции и откат
+    with st.expander("Версии коллекции"):
+        alias_name = collection_name.strip()
+        client = get_qdrant_client()
+        try:
+            versions = list_collection_versions(
+                client, alias_name, finished_only=True)
+            current = get_alias_target(client, alias_name)
+        except Exception as e:
+            st.warning(f"Не удалось получить версии коллекции: {e}")
+            return
+        if not versions:
+            st.write("Завершённых версий нет: коллекция ещё не загружалась с переключением через алиас")
+        else:
+            st.write(f"Текущая версия: {current or 'не назначена'}")
+            version = st.selectbox(
+                "Версия", list(reversed(versions)),
+                help="Алиас будет атомарно переключён на выбранную версию")
+            if st.button("Переключить на выбранную версию", disabled=version == current):
+                try:
+                    switch_collection_alias(client, alias_name, version)
+                    st.success(f"Алиас {alias_name} переключён на {version}")
+                except CollectionVersionError as e:
+                    st.error(str(e))
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,282 @@
+# Локальный индекс для MCP сервера без Qdrant: матрицы векторов в memory-mapped файлах
+#
+# Структура версии индекса <LOCAL_INDEX_DIR>/<имя>__v<дата-время>/:
+#   manifest.json          — модель, размерность, количество точек, формат, типы объектов
+#   <вектор>.f32           — матрица float32 (count x dimensions), либо
+#   <вектор>.i8 + .scale   — матрица int8 и масштаб каждой строки (float32)
+#   <вектор>.ivf_*         — IVF: центроиды, порядок строк по спискам, границы списков
+#   payloads.jsonl         — payload объектов (JSON по строке), payloads.offsets — смещения (uint64)
+#   object_types.bits      — битовые маски строк по типам объектов (np.packbits)
+# Рабочее имя <LOCAL_INDEX_DIR>/<имя> — символическая ссылка на версию, переключается атомарно.
+#
+#   python local_index.py export --collection 1c_rag   — выгрузка готовой коллекции из Qdrant
+import argparse
+import json
+import os
+import shutil
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+from config import (
+    LOCAL_INDEX_DIR, LOCAL_INDEX_DTYPE, LOCAL_INDEX_IVF_MIN_POINTS, LOCAL_INDEX_IVF_ITERATIONS,
+    KEEP_COLLECTION_VERSIONS, COLLECTION_VERSION_SEPARATOR, QDRANT_HOST, QDRANT_PORT, COLLECTION_NAME
+)
+from collection_store import new_version_name
+
+FORMAT_VERSION = 1
+VECTOR_NAMES = ["object_name", "friendly_name"]
+# Размер блока строк при обработке матриц, чтобы не читать весь файл в память
+CHUNK_ROWS = 16384
+# Максимальный размер выборки для обучения центроидов IVF
+IVF_TRAIN_SAMPLE = 20000
+
+
+def spherical_kmeans(vectors, nlist, iterations, seed=0):
+    """Центроиды IVF для нормированных векторов (близость — скалярное произведение)"""
+    rng = np.random.default_rng(seed)
+    sample_size = min(len(vectors), IVF_TRAIN_SAMPLE)
+    sample = np.asarray(
+        vectors[np.sort(rng.choice(len(vectors), sample_size, replace=False))], dtype=np.float32)
+    centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignment = np.argmax(sample @ centroids.T, axis=1)
+        for cluster in range(nlist):
+            members = sample[assignment == cluster]
+            if len(members):
+                centroid = members.sum(axis=0)
+                centroids[cluster] = centroid / \
+                    max(np.linalg.norm(centroid), 1e-12)
+    return centroids
+
+
+def assign_to_centroids(vectors, centroids):
+    """Номер списка IVF для каждой строки матрицы (поблочно)"""
+    assignment = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), CHUNK_ROWS):
+        block = np.asarray(vectors[start:start + CHUNK_ROWS], dtype=np.float32)
+        assignment[start:start + CHUNK_ROWS] = np.argmax(
+            block @ centroids.T, axis=1)
+    return assignment
+
+
+def switch_index_link(index_dir, alias_name, version_name):
+    """Атомарное переключение символической ссылки <имя> на версию индекса"""
+    link_path = index_dir / alias_name
+    if link_path.exists() and not link_path.is_symlink():
+        raise RuntimeError(
+            f"{link_path} не является символической ссылкой, переключение невозможно")
+    tmp_link = index_dir / f".{alias_name}.tmp"
+    if tmp_link.is_symlink() or tmp_link.exists():
+        tmp_link.unlink()
+    # Относительная ссылка работает при любой точке монтирования каталога
+    os.symlink(version_name, tmp_link)
+    os.replace(tmp_link, link_path)
+
+
+def cleanup_index_versions(index_dir, alias_name):
+    """Удаление старых версий индекса сверх KEEP_COLLECTION_VERSIONS, возвращает удалённые"""
+    link_path = index_dir / alias_name
+    current = os.readlink(link_path) if link_path.is_symlink() else None
+    prefix = f"{alias_name}{COLLECTION_VERSION_SEPARATOR}"
+    versions = sorted(path.name for path in index_dir.iterdir()
+                      if path.is_dir() and not path.is_symlink()
+                      and path.name.startswith(prefix) and path.name != current)
+    removed = versions[:max(0, len(versions) - (KEEP_COLLECTION_VERSIONS - 1))]
+    for version in removed:
+        shutil.rmtree(index_dir / version)
+    return removed
+
+
+class LocalIndexWriter:
+    """Потоковая запись локального индекса: add() по батчам, затем build() и publish() (или finalize())"""
+
+    def __init__(self, alias_name, dimensions, index_dir=LOCAL_INDEX_DIR, dtype=LOCAL_INDEX_DTYPE):
+        self.alias_name = alias_name
+        self.dimensions = dimensions
+        self.dtype = dtype
+        self.index_dir = Path(index_dir)
+        self.version_name = new_version_name(alias_name)
+        self.path = self.index_dir / self.version_name
+        self.path.mkdir(parents=True, exist_ok=False)
+        self.finalized = False
+
+        self.count = 0
+        self.object_types = []
+        self._offsets = [0]
+        self._vector_files = {
+            name: open(self.path / f"{name}.f32", "wb") for name in VECTOR_NAMES}
+        self._payload_file = open(self.path / "payloads.jsonl", "wb")
+
+    def add(self, object_name_embeddings, friendly_name_embeddings, payloads):
+        """Добавление батча объектов (векторы в порядке payloads)"""
+        for name, embeddings in zip(VECTOR_NAMES, (object_name_embeddings, friendly_name_embeddings)):
+            matrix = np.asarray(embeddings, dtype=np.float32)
+            if matrix.shape != (len(payloads), self.dimensions):
+                raise ValueError(
+                    f"Размер матрицы {name} {matrix.shape} не соответствует {len(payloads)} x {self.dimensions}")
+            matrix.tofile(self._vector_files[name])
+
+        for payload in payloads:
+            line = json.dumps(payload, ensure_ascii=False).encode(
+                "utf-8") + b"\n"
+            self._payload_file.write(line)
+            self._offsets.append(self._offsets[-1] + len(line))
+            self.object_types.append(payload.get("object_type", ""))
+        self.count += len(payloads)
+
+    def _close_files(self):
+        for file in self._vector_files.values():
+            file.close()
+        self._payload_file.close()
+
+    def _write_ivf(self, name, vectors):
+        nlist = max(1, int(np.sqrt(self.count)))
+        centroids = spherical_kmeans(
+            vectors, nlist, LOCAL_INDEX_IVF_ITERATIONS)
+        assignment = assign_to_centroids(vectors, centroids)
+        order = np.argsort(assignment, kind="stable").astype(np.int32)
+        offsets = np.concatenate(
+            [[0], np.cumsum(np.bincount(assignment, minlength=nlist))]).astype(np.int64)
+        centroids.astype(np.float32).tofile(self.path / f"{name}.ivf_centroids")
+        order.tofile(self.path / f"{name}.ivf_order")
+        offsets.tofile(self.path / f"{name}.ivf_offsets")
+        return nlist
+
+    def _quantize_int8(self, name, vectors):
+        """Симметричная int8-квантизация по строкам: v ≈ q * scale / 127"""
+        matrix = np.memmap(self.path / f"{name}.i8", dtype=np.int8,
+                           mode="w+", shape=(self.count, self.dimensions))
+        scales = np.empty(self.count, dtype=np.float32)
+        for start in range(0, self.count, CHUNK_ROWS):
+            block = np.asarray(vectors[start:start + CHUNK_ROWS])
+            block_scales = np.maximum(np.abs(block).max(axis=1), 1e-12)
+            matrix[start:start + CHUNK_ROWS] = np.round(
+                block / block_scales[:, None] * 127).astype(np.int8)
+            scales[start:start + CHUNK_ROWS] = block_scales
+        matrix.flush()
+        scales.tofile(self.path / f"{name}.scale")
+
+    def build(self, manifest):
+        """Индексы IVF, квантизация, маски типов и манифест (ссылка на версию не переключается)"""
+        self._close_files()
+        np.asarray(self._offsets, dtype=np.uint64).tofile(
+            self.path / "payloads.offsets")
+
+        type_names = sorted(set(self.object_types))
+        type_ids = np.asarray([type_names.index(object_type)
+                               for object_type in self.object_types], dtype=np.int32)
+        with open(self.path / "object_types.bits", "wb") as file:
+            for type_id in range(len(type_names)):
+                np.packbits(type_ids == type_id).tofile(file)
+
+        ivf = {}
+        for name in VECTOR_NAMES:
+            vectors = np.memmap(self.path / f"{name}.f32", dtype=np.float32,
+                                mode="r", shape=(self.count, self.dimensions)) if self.count else None
+            if vectors is not None and LOCAL_INDEX_IVF_MIN_POINTS and self.count >= LOCAL_INDEX_IVF_MIN_POINTS:
+                ivf[name] = self._write_ivf(name, vectors)
+            if vectors is not None and self.dtype == "int8":
+                self._quantize_int8(name, vectors)
+                del vectors
+                os.remove(self.path / f"{name}.f32")
+
+        (self.path / "manifest.json").write_text(json.dumps({
+            **manifest,
+            "format_version": FORMAT_VERSION,
+            "dimensions": self.dimensions,
+            "count": self.count,
+            "dtype": self.dtype,
+            "vectors": VECTOR_NAMES,
+            "object_types": type_names,
+            "ivf": ivf
+        }, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    def publish(self):
+        """Переключение ссылки на построенную версию, возвращает удалённые старые версии"""
+        switch_index_link(self.index_dir, self.alias_name, self.version_name)
+        self.finalized = True
+        return cleanup_index_versions(self.index_dir, self.alias_name)
+
+    def finalize(self, manifest):
+        """Построение версии и переключение ссылки на неё"""
+        self.build(manifest)
+        return self.publish()
+
+    def abort(self):
+        """Удаление недостроенной версии индекса"""
+        self._close_files()
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+def export_from_qdrant(collection_name, index_dir=LOCAL_INDEX_DIR, dtype=LOCAL_INDEX_DTYPE, batch_size=1000):
+    """Выгрузка векторов object_name/friendly_name и payload объектов из коллекции Qdrant"""
+    from qdrant_client import QdrantClient
+    from qdrant_client.models import Filter, FieldCondition, MatchAny
+    from collection_store import resolve_collection_name, read_manifest
+
+    client = QdrantClient(host=QDRANT_HOST, port=QDRANT_PORT)
+    physical_name = resolve_collection_name(client, collection_name)
+    vectors_config = client.get_collection(
+        physical_name).config.params.vectors
+    dimensions = vectors_config[VECTOR_NAMES[0]].size
+    manifest = read_manifest(client, physical_name) or {}
+
+    writer = LocalIndexWriter(collection_name, dimensions, index_dir, dtype)
+    try:
+        # Разделы и манифест сборки не имеют векторов имён и в индекс не входят
+        objects_filter = Filter(must_not=[FieldCondition(
+            key="point_type", match=MatchAny(any=["section", "manifest"]))])
+        offset = None
+        while True:
+            points, offset = client.scroll(
+                collection_name=physical_name, scroll_filter=objects_filter,
+                limit=batch_size, offset=offset, with_payload=True, with_vectors=VECTOR_NAMES)
+            if points:
+                writer.add([point.vector[VECTOR_NAMES[0]] for point in points],
+                           [point.vector[VECTOR_NAMES[1]] for point in points],
+                           [point.payload for point in points])
+                print(f"Выгружено точек: {writer.count}")
+            if offset is None:
+                break
+
+        removed = writer.finalize({
+            **manifest,
+            "source_collection": physical_name,
+            "created_at": manifest.get("created_at") or datetime.now(timezone.utc).isoformat()
+        })
+    except Exception:
+        writer.abort()
+        raise
+
+    print(f"Локальный индекс {writer.path} ({writer.count} объектов, {dtype})")
+    for version in removed:
+        print(f"Удалена устаревшая версия {version}.")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Локальный индекс для MCP сервера без Qdrant")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    export_parser = subparsers.add_parser(
+        "export", help="Выгрузить коллекцию Qdrant в локальный индекс")
+    export_parser.add_argument("--collection", default=COLLECTION_NAME,
+                               help="Имя коллекции или алиаса")
+    export_parser.add_argument("--output", default=LOCAL_INDEX_DIR,
+                               help="Каталог локальных индексов")
+    export_parser.add_argument("--dtype", choices=["float32", "int8"], default=LOCAL_INDEX_DTYPE,
+                               help="Формат хранения векторов")
+    args = parser.parse_args()
+
+    try:
+        export_from_qdrant(args.collection, args.output, args.dtype)
+    except Exception as e:
+        print(f"Ошибка: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+# Экспорт и восстановление коллекции через снапшоты Qdrant без повторной генерации эмбеддингов
+#
+#   python snapshot.py export --collection 1c_rag --output ./snapshots
+#   python snapshot.py import ./snapshots/<снапшот>.snapshot --collection 1c_rag
+import argparse
+import hashlib
+import json
+import sys
+from pathlib import Path
+
+import requests
+from qdrant_client import QdrantClient
+from requests_toolbelt import MultipartEncoder
+
+from config import EMBEDDING_SERVICE_URL, QDRANT_HOST, QDRANT_PORT, COLLECTION_NAME
+from collection_store import (
+    resolve_collection_name, new_version_name, read_manifest, write_manifest, is_legacy_collection,
+    wait_for_collection_ready, switch_collection_alias, cleanup_collection_versions,
+    CollectionVersionError
+)
+
+QDRANT_URL = f"http://{QDRANT_HOST}:{QDRANT_PORT}"
+MANIFEST_SUFFIX = ".manifest.json"
+# Снапшот полной выгрузки УПП — сотни мегабайт, передаём частями
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+SNAPSHOT_TRANSFER_TIMEOUT = 3600
+
+
+class SnapshotError(Exception):
+    """Ошибка экспорта или восстановления снапшота"""
+
+
+def get_model_info():
+    """Информация о модели сервиса эмбеддингов"""
+    try:
+        response = requests.get(
+            f"{EMBEDDING_SERVICE_URL}/model-info", timeout=30)
+        response.raise_for_status()
+        return response.json()
+    except requests.RequestException as e:
+        raise SnapshotError(
+            f"Не удается получить информацию о модели эмбеддингов: {e}")
+
+
+def file_sha256(path):
+    """SHA-256 файла"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(DOWNLOAD_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def export_collection(client, collection_name, output_dir, keep_remote=False):
+    """Создание снапшота коллекции и скачивание его вместе с манифестом"""
+    physical_name = resolve_collection_name(client, collection_name)
+    if not client.collection_exists(physical_name):
+        raise SnapshotError(
+            f"Коллекция '{collection_name}' не существует в Qdrant")
+
+    manifest = read_manifest(client, physical_name)
+    if manifest is None:
+        # Коллекция загружена до появления манифестов: берём модель у сервиса
+        model_info = get_model_info()
+        manifest = {
+            "model_name": model_info.get("model_name"),
+            "dimensions": model_info.get("dimensions"),
+            "source_hash": None
+        }
+        print("Манифест в коллекции не найден, модель взята из сервиса эмбеддингов",
+              file=sys.stderr)
+
+    print(f"Создание снапшота коллекции {physical_name}...")
+    snapshot = client.create_snapshot(
+        collection_name=physical_name, wait=True)
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    snapshot_path = output_dir / snapshot.name
+
+    print(f"Скачивание {snapshot.name} ({snapshot.size} байт)...")
+    try:
+        with requests.get(f"{QDRANT_URL}/collections/{physical_name}/snapshots/{snapshot.name}",
+                          stream=True, timeout=SNAPSHOT_TRANSFER_TIMEOUT) as response:
+            response.raise_for_status()
+            with open(snapshot_path, "wb") as file:
+                for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                    file.write(chunk)
+    except requests.RequestException as e:
+        raise SnapshotError(f"Ошибка скачивания снапшота: {e}")
+
+    if not keep_remote:
+        client.delete_snapshot(collection_name=physical_name,
+                               snapshot_name=snapshot.name, wait=True)
+
+    manifest = {
+        **manifest,
+        "collection": collection_name,
+        "source_collection": physical_name,
+        "snapshot": snapshot.name,
+        "checksum": file_sha256(snapshot_path)
+    }
+    manifest_path = Path(f"{snapshot_path}{MANIFEST_SUFFIX}")
+    manifest_path.write_text(json.dumps(
+        manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    print(f"Снапшот: {snapshot_path}")
+    print(f"Манифест: {manifest_path}")
+    return snapshot_path
+
+
+def upload_snapshot(snapshot_path, collection_name):
+    """Загрузка файла снапшота в Qdrant потоком, без чтения всего файла в память"""
+    try:
+        with open(snapshot_path, "rb") as file:
+            encoder = MultipartEncoder(
+                fields={"snapshot": (snapshot_path.name, file, "application/octet-stream")})
+            response = requests.post(
+                f"{QDRANT_URL}/collections/{collection_name}/snapshots/upload",
+                params={"priority": "snapshot", "wait": "true"},
+                data=encoder,
+                headers={"Content-Type": encoder.content_type},
+                timeout=SNAPSHOT_TRANSFER_TIMEOUT
+            )
+    except requests.RequestException as e:
+        raise SnapshotError(f"Ошибка загрузки снапшота: {e}")
+    if response.status_code != 200:
+        raise SnapshotError(
+            f"Ошибка восстановления снапшота: {response.status_code} {response.text}")
+
+
+def import_collection(client, snapshot_path, collection_name=None):
+    """Восстановление снапшота в новую версию коллекции и переключение алиаса"""
+    snapshot_path = Path(snapshot_path)
+    manifest_path = Path(f"{snapshot_path}{MANIFEST_SUFFIX}")
+    if not snapshot_path.exists():
+        raise SnapshotError(f"Файл снапшота не найден: {snapshot_path}")
+    if not manifest_path.exists():
+        raise SnapshotError(f"Файл манифеста не найден: {manifest_path}")
+
+    manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+    alias_name = collection_name or manifest.get(
+        "collection") or COLLECTION_NAME
+
+    # Векторы снапшота совместимы только с той же моделью эмбеддингов
+    model_info = get_model_info()
+    if (model_info.get("model_name") != manifest.get("model_name") or
+            model_info.get("dimensions") != manifest.get("dimensions")):
+        raise SnapshotError(
+            f"Модель снапшота {manifest.get('model_name')} ({manifest.get('dimensions')}) "
+            f"не совпадает с моделью сервиса эмбеддингов {model_info.get('model_name')} "
+            f"({model_info.get('dimensions')}), восстановление отменено")
+
+    print("Проверка контрольной суммы...")
+    if manifest.get("checksum") and file_sha256(snapshot_path) != manifest["checksum"]:
+        raise SnapshotError("Контрольная сумма снапшота не совпадает с манифестом")
+
+    version_name = new_version_name(alias_name)
+    switched = False
+    try:
+        print(f"Загрузка снапшота в {version_name}...")
+        upload_snapshot(snapshot_path, version_name)
+
+        if read_manifest(client, version_name) is None:
+            # Снапшот коллекции, загруженной до появления манифестов: без манифеста версия
+            # считается недостроенной, поэтому записываем его из файла манифеста
+            write_manifest(client, version_name, {
+                key: value for key, value in manifest.items()
+                if key not in ("collection", "source_collection", "snapshot", "checksum")
+            })
+
+        print(f"Ожидание оптимизации коллекции {version_name}...")
+        if not wait_for_collection_ready(client, version_name):
+            print("Оптимизация не завершилась за отведённое время, коллекция будет переключена без её завершения",
+                  file=sys.stderr)
+
+        if is_legacy_collection(client, alias_name):
+            print(f"Удаление коллекции {alias_name} без версий, чтобы использовать это имя как алиас...")
+        switch_collection_alias(client, alias_name, version_name)
+        switched = True
+    finally:
+        # Недовосстановленная версия не нужна: рабочая коллекция осталась прежней
+        if not switched:
+            try:
+                if client.collection_exists(version_name):
+                    print(f"Удаление недовосстановленной версии {version_name}...",
+                          file=sys.stderr)
+                    client.delete_collection(version_name)
+            except Exception as e:
+                print(f"Не удалось удалить недовосстановленную версию {version_name}: {e}",
+                      file=sys.stderr)
+
+    print(f"Алиас {alias_name} переключён на {version_name}.")
+    for version in cleanup_collection_versions(client, alias_name):
+        print(f"Удалена устаревшая версия {version}.")
+    return version_name
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Экспорт и восстановление коллекции Qdrant через снапшоты")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser(
+        "export", help="Создать снапшот коллекции с манифестом")
+    export_parser.add_argument("--collection", default=COLLECTION_NAME,
+                               help="Имя коллекции или алиаса")
+    export_parser.add_argument("--output", default="snapshots",
+                               help="Папка для снапшота и манифеста")
+    export_parser.add_argument("--keep-remote", action="store_true",
+                               help="Не удалять снапшот на сервере Qdrant после скачивания")
+
+    import_parser = subparsers.add_parser(
+        "import", help="Восстановить коллекцию из снапшота")
+    import_parser.add_argument("snapshot", help="Путь к файлу снапшота")
+    import_parser.add_argument("--collection", default=None,
+                               help="Имя коллекции (алиаса); по умолчанию из манифеста")
+
+    args = parser.parse_args()
+    client = QdrantClient(host=QDRANT_HOST, port=QDRANT_PORT,
+                          timeout=SNAPSHOT_TRANSFER_TIMEOUT)
+    try:
+        if args.command == "export":
+            export_collection(client, args.collection,
+                              args.output, args.keep_remote)
+        else:
+            import_collection(client, args.snapshot, args.collection)
+    except (SnapshotError, CollectionVersionError) as e:
+        print(f"Ошибка: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
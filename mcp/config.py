@@ -13,6 +13,15 @@ COLLECTION_NAME = os.getenv("COLLECTION_NAME", "1c_rag")
 # Embedding service settings
 EMBEDDING_SERVICE_URL = os.getenv(
     "EMBEDDING_SERVICE_URL", "http://localhost:5000")
+# Эмбеддинги запросов: remote — через сервис эмбеддингов, local — модель в процессе сервера
+# (при ошибке загрузки модели используется сервис)
+QUERY_EMBEDDING_MODE = os.getenv("QUERY_EMBEDDING_MODE", "remote")
+# Конфигурация модели — тот же файл, что у сервиса эмбеддингов (embeddings/config.json)
+EMBEDDING_CONFIG_PATH = os.getenv("EMBEDDING_CONFIG_PATH", os.path.join(
+    os.path.dirname(__file__), "embedding_config.json"))
+# Квантизация локальной модели: none или int8 (динамическая, только для CPU)
+LOCAL_EMBEDDING_QUANTIZATION = os.getenv(
+    "LOCAL_EMBEDDING_QUANTIZATION", "none")
 
 # Server settings
 SERVER_NAME = os.getenv("SERVER_NAME", "MCP 1C RAG Server")
@@ -35,3 +44,38 @@ OBJECT_NAME_VECTOR = "object_name"
 FRIENDLY_NAME_VECTOR = "friendly_name"
 # Множитель для prefetch лимита в мультивекторном поиске
 PREFETCH_LIMIT_MULTIPLIER = int(os.getenv("PREFETCH_LIMIT_MULTIPLIER", "3"))
+
+# Federated search settings
+# Разделитель имён коллекций в заголовке x-collection-name
+COLLECTION_NAMES_SEPARATOR = ","
+# Способ объединения результатов из нескольких коллекций: rrf или normalized
+FEDERATED_FUSION = os.getenv("FEDERATED_FUSION", "rrf")
+# Константа k для RRF при объединении результатов разных коллекций
+FEDERATED_RRF_K = int(os.getenv("FEDERATED_RRF_K", "60"))
+# Максимальное количество коллекций в одном запросе
+MAX_FEDERATED_COLLECTIONS = int(os.getenv("MAX_FEDERATED_COLLECTIONS", "8"))
+
+# Section search settings
+# Имя вектора содержимого разделов (коллекции, загруженные в режиме sections)
+CONTENT_VECTOR = "content"
+# Сколько найденных разделов возвращать для одного объекта
+SECTION_GROUP_SIZE = int(os.getenv("SECTION_GROUP_SIZE", "3"))
+# Время кэширования сведений о схеме коллекции, секунд
+COLLECTION_INFO_TTL = int(os.getenv("COLLECTION_INFO_TTL", "60"))
+
+# Reference graph settings
+# Максимальная глубина обхода графа ссылок и размер подграфа
+MAX_GRAPH_DEPTH = int(os.getenv("MAX_GRAPH_DEPTH", "3"))
+MAX_GRAPH_NODES = int(os.getenv("MAX_GRAPH_NODES", "200"))
+# Размер страницы при чтении payload объектов для построения графа
+GRAPH_SCROLL_BATCH_SIZE = int(os.getenv("GRAPH_SCROLL_BATCH_SIZE", "1000"))
+
+# Search backend settings
+# qdrant — поиск в Qdrant, local — встроенный поиск по локальному индексу (numpy, memory-mapped файлы)
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "qdrant")
+# Каталог локальных индексов (записывает loader), имя коллекции — ссылка на текущую версию
+LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", "local_index")
+# Сколько списков IVF просматривать (для индексов с IVF)
+LOCAL_IVF_NPROBE = int(os.getenv("LOCAL_IVF_NPROBE", "8"))
+# Константа k для RRF в локальном поиске (как у Qdrant по умолчанию)
+LOCAL_RRF_K = int(os.getenv("LOCAL_RRF_K", "2"))
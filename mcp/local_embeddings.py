@@ -0,0 +1,84 @@
+# Локальная генерация эмбеддингов запросов в процессе MCP сервера
+#
+# Использует ту же модель и те же параметры кодирования, что и сервис эмбеддингов
+# (embeddings/embedding_service.py), поэтому векторы совместимы с загруженными коллекциями.
+# sentence-transformers — необязательная зависимость (requirements-local.txt).
+import json
+import logging
+from typing import List
+
+logger = logging.getLogger(__name__)
+
+QUERY_TASK = "retrieval.query"
+
+
+class LocalQueryEmbedder:
+    """Модель эмбеддингов в процессе сервера, только для запросов"""
+
+    def __init__(self, model, model_name: str, dimensions: int, supports_task: bool):
+        self.model = model
+        self.model_name = model_name
+        self.dimensions = dimensions
+        self.supports_task = supports_task
+
+    def embed_query(self, query: str) -> List[float]:
+        """Эмбеддинг запроса с теми же параметрами, что у сервиса эмбеддингов"""
+        if self.supports_task:
+            embeddings = self.model.encode(
+                [query],
+                task=QUERY_TASK,
+                prompt_name=QUERY_TASK,
+                normalize_embeddings=True,
+                output_value="sentence_embedding",
+                precision="float32",
+                convert_to_numpy=True
+            )
+        else:
+            embeddings = self.model.encode(
+                [query],
+                normalize_embeddings=True,
+                convert_to_numpy=True
+            )
+        return embeddings[0].tolist()
+
+
+def load_local_embedder(config_path: str, quantization: str = "none") -> LocalQueryEmbedder | None:
+    """Загрузка модели из конфигурации сервиса эмбеддингов, None при любой ошибке"""
+    try:
+        with open(config_path, "r", encoding="utf-8") as f:
+            config = json.load(f)
+
+        from sentence_transformers import SentenceTransformer
+
+        model_name = config["model"]["name"]
+        model = SentenceTransformer(
+            model_name, trust_remote_code=config["model"].get("trust_remote_code", False), device="cpu")
+
+        if quantization == "int8":
+            # Динамическая int8-квантизация линейных слоёв: быстрее на CPU,
+            # векторы близки к исходным (косинус ~0.99), но не идентичны
+            import torch
+            model = torch.quantization.quantize_dynamic(
+                model, {torch.nn.Linear}, dtype=torch.qint8)
+
+        model_info = config.get("models_info", {}).get(model_name, {})
+        embedder = LocalQueryEmbedder(
+            model,
+            model_name,
+            model_info.get("dimensions", 384),
+            model_info.get("supports_task", False)
+        )
+
+        # Пробное кодирование: проверяем модель и размерность до первого запроса
+        dimensions = len(embedder.embed_query("проверка"))
+        if dimensions != embedder.dimensions:
+            raise ValueError(
+                f"размерность модели {dimensions} не совпадает с конфигурацией {embedder.dimensions}")
+
+        logger.info(
+            f"Локальная модель эмбеддингов {model_name} загружена (квантизация: {quantization})")
+        return embedder
+    except Exception as e:
+        logger.warning(
+            f"Не удалось загрузить локальную модель эмбеддингов, используется сервис эмбеддингов: {e}")
+        return None
@@ -0,0 +1,134 @@
+# Встроенный поиск по локальному индексу (numpy + memory-mapped файлы) без Qdrant
+#
+# Формат индекса записывает loader (loader/local_index.py). Поиск — полный перебор
+# или IVF по матрицам object_name/friendly_name, фильтр по типу объекта — битовая маска,
+# объединение результатов двух векторов — RRF, как в мультивекторном поиске Qdrant.
+import json
+import mmap
+import os
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+# Размер блока строк при полном переборе
+CHUNK_ROWS = 16384
+
+
+class LocalIndex:
+    """Версия локального индекса, открытая через memory-mapped файлы"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "manifest.json"), "r", encoding="utf-8") as f:
+            self.manifest = json.load(f)
+
+        self.count = self.manifest["count"]
+        self.dimensions = self.manifest["dimensions"]
+        self.dtype = self.manifest.get("dtype", "float32")
+        shape = (self.count, self.dimensions)
+
+        self.matrices = {}
+        self.scales = {}
+        self.ivf = {}
+        for name in self.manifest["vectors"]:
+            if not self.count:
+                continue
+            if self.dtype == "int8":
+                self.matrices[name] = np.memmap(self._file(f"{name}.i8"), dtype=np.int8, mode="r", shape=shape)
+                self.scales[name] = np.fromfile(self._file(f"{name}.scale"), dtype=np.float32) / 127
+            else:
+                self.matrices[name] = np.memmap(self._file(f"{name}.f32"), dtype=np.float32, mode="r", shape=shape)
+            nlist = self.manifest.get("ivf", {}).get(name)
+            if nlist:
+                self.ivf[name] = (
+                    np.fromfile(self._file(f"{name}.ivf_centroids"),
+                                dtype=np.float32).reshape(nlist, self.dimensions),
+                    np.fromfile(self._file(f"{name}.ivf_order"), dtype=np.int32),
+                    np.fromfile(self._file(f"{name}.ivf_offsets"), dtype=np.int64)
+                )
+
+        self.offsets = np.fromfile(self._file("payloads.offsets"), dtype=np.uint64)
+        self._payload_file = open(self._file("payloads.jsonl"), "rb")
+        self._payloads = mmap.mmap(self._payload_file.fileno(), 0, access=mmap.ACCESS_READ) if self.count else b""
+
+        # Битовые маски типов объектов: одна строка packbits на тип
+        self.object_types = self.manifest.get("object_types", [])
+        bits = np.fromfile(self._file("object_types.bits"), dtype=np.uint8)
+        self.type_bits = bits.reshape(len(self.object_types), -1) if self.object_types else bits
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def type_mask(self, object_type: Optional[str]) -> Optional[np.ndarray]:
+        """Маска строк с указанным типом объекта, None — без фильтра"""
+        if not object_type:
+            return None
+        if object_type not in self.object_types:
+            return np.zeros(self.count, dtype=bool)
+        bits = self.type_bits[self.object_types.index(object_type)]
+        return np.unpackbits(bits, count=self.count).astype(bool)
+
+    def _scores(self, name: str, query: np.ndarray, rows: Optional[np.ndarray]) -> np.ndarray:
+        """Скалярные произведения запроса со строками матрицы (векторы нормированы — это косинус)"""
+        matrix = self.matrices[name]
+        if rows is None:
+            scores = np.empty(self.count, dtype=np.float32)
+            for start in range(0, self.count, CHUNK_ROWS):
+                block = np.asarray(matrix[start:start + CHUNK_ROWS], dtype=np.float32)
+                scores[start:start + CHUNK_ROWS] = block @ query
+        else:
+            scores = np.asarray(matrix[rows], dtype=np.float32) @ query
+        if name in self.scales:
+            scores *= self.scales[name] if rows is None else self.scales[name][rows]
+        return scores
+
+    def search(self, name: str, query: np.ndarray, limit: int, mask: Optional[np.ndarray] = None,
+               nprobe: int = 0) -> List[tuple]:
+        """Top-k строк по одному вектору: [(строка, оценка)] по убыванию оценки"""
+        if not self.count or limit <= 0:
+            return []
+
+        rows = None
+        masked_rows = np.flatnonzero(mask) if mask is not None else None
+        if name in self.ivf and nprobe > 0:
+            centroids, order, list_offsets = self.ivf[name]
+            # Фильтр оставляет меньше строк, чем просмотрел бы IVF, — дешевле полный перебор по ним
+            if masked_rows is None or len(masked_rows) > nprobe * self.count / len(centroids):
+                # IVF: перебор только в ближайших к запросу списках
+                probes = np.argsort(centroids @ query)[::-1][:nprobe]
+                rows = np.sort(np.concatenate(
+                    [order[list_offsets[probe]:list_offsets[probe + 1]] for probe in probes]))
+                if masked_rows is not None:
+                    rows = rows[mask[rows]]
+                    # Подходящие по фильтру объекты могут лежать вне просмотренных списков
+                    if len(rows) < limit:
+                        rows = masked_rows
+        if rows is None:
+            rows = masked_rows
+        if rows is not None and not len(rows):
+            return []
+
+        scores = self._scores(name, query, rows)
+        top = min(limit, len(scores))
+        best = np.argpartition(-scores, top - 1)[:top]
+        best = best[np.argsort(-scores[best])]
+        candidates = best if rows is None else rows[best]
+        return [(int(row), float(score)) for row, score in zip(candidates, scores[best])]
+
+    def payload(self, row: int) -> Dict[str, Any]:
+        """Payload объекта по номеру строки"""
+        return json.loads(self._payloads[int(self.offsets[row]):int(self.offsets[row + 1])])
+
+    def iter_payloads(self) -> Iterator[Dict[str, Any]]:
+        """Все payload индекса (для построения графа ссылок)"""
+        for row in range(self.count):
+            yield self.payload(row)
+
+
+def rrf_fuse(ranked_lists: List[List[tuple]], limit: int, k: int) -> List[tuple]:
+    """Reciprocal Rank Fusion: сумма 1 / (k + позиция) по всем спискам"""
+    scores: Dict[int, float] = {}
+    for ranked in ranked_lists:
+        for rank, (row, _) in enumerate(ranked):
+            scores[row] = scores.get(row, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
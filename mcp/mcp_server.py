@@ -3,9 +3,15 @@ from fastmcp.server.dependencies import get_http_headers
 from starlette.requests import Request
 from starlette.responses import JSONResponse
 import json
+import logging
+import time
+import threading
+import os
+import numpy as np
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from qdrant_client import QdrantClient
-from qdrant_client.models import Filter, Prefetch, FusionQuery, Fusion
+from qdrant_client.models import Filter, Prefetch, FusionQuery, Fusion, FieldCondition, MatchAny
 from typing import Dict, Any, List, Literal
 from pydantic import BaseModel, Field
 
@@ -14,14 +20,47 @@ from config import (
     SERVER_HOST, SERVER_PORT, DEFAULT_SEARCH_LIMIT, MAX_SEARCH_LIMIT,
     MIN_SEARCH_LIMIT, SERVER_NAME,
     EMBEDDING_REQUEST_TIMEOUT, HEALTH_CHECK_TIMEOUT,
-    OBJECT_NAME_VECTOR, FRIENDLY_NAME_VECTOR, PREFETCH_LIMIT_MULTIPLIER
+    OBJECT_NAME_VECTOR, FRIENDLY_NAME_VECTOR, PREFETCH_LIMIT_MULTIPLIER,
+    COLLECTION_NAMES_SEPARATOR, FEDERATED_FUSION, FEDERATED_RRF_K,
+    MAX_FEDERATED_COLLECTIONS, CONTENT_VECTOR, SECTION_GROUP_SIZE,
+    COLLECTION_INFO_TTL, QUERY_EMBEDDING_MODE, EMBEDDING_CONFIG_PATH,
+    LOCAL_EMBEDDING_QUANTIZATION, MAX_GRAPH_DEPTH, MAX_GRAPH_NODES,
+    GRAPH_SCROLL_BATCH_SIZE, SEARCH_BACKEND, LOCAL_INDEX_DIR, LOCAL_IVF_NPROBE,
+    LOCAL_RRF_K
 )
+from local_embeddings import load_local_embedder
+from reference_graph import ReferenceGraph
+from local_search import LocalIndex, rrf_fuse
+
+logger = logging.getLogger(__name__)
 
 mcp = FastMCP(name=SERVER_NAME)
 
 # Подключение к Qdrant
 qdrant_client = QdrantClient(host=QDRANT_HOST, port=QDRANT_PORT)
 
+# Локальная модель для эмбеддингов запросов (None — используется сервис эмбеддингов)
+local_embedder = load_local_embedder(
+    EMBEDDING_CONFIG_PATH, LOCAL_EMBEDDING_QUANTIZATION) if QUERY_EMBEDDING_MODE == "local" else None
+# После стольких ошибок подряд локальная модель отключается до перезапуска сервера
+MAX_LOCAL_EMBEDDING_FAILURES = 3
+_local_embedding_failures = 0
+
+# Кэш признака "коллекция загружена по разделам": имя -> (признак, время проверки)
+_sectioned_collections: Dict[str, tuple] = {}
+# Графы ссылок по версиям коллекций (версия не меняется после загрузки)
+_reference_graphs: Dict[str, ReferenceGraph] = {}
+_reference_graphs_lock = threading.Lock()
+# Сколько графов держать в памяти (старые версии вытесняются)
+MAX_CACHED_GRAPHS = 8
+# Открытые версии локальных индексов (SEARCH_BACKEND=local): путь версии -> индекс
+_local_indexes: Dict[str, LocalIndex] = {}
+_local_indexes_lock = threading.Lock()
+# Сколько версий локальных индексов держать открытыми (старые версии вытесняются)
+MAX_CACHED_LOCAL_INDEXES = 8
+# Где искались коллекции — для сообщений об отсутствующей коллекции
+SEARCH_BACKEND_LOCATION = "локальном индексе" if SEARCH_BACKEND == "local" else "Qdrant"
+
 
 class SearchRequest(BaseModel):
     """Модель запроса для поиска в документации 1С"""
@@ -45,6 +84,16 @@ class SearchRequest(BaseModel):
         default=True,
         description="Использовать мультивекторный поиск с RRF для более точного ранжирования результатов"
     )
+    collections: List[str] | None = Field(
+        default=None,
+        description="Список коллекций для федеративного поиска. Если не указан, используется заголовок x-collection-name",
+        min_length=1,
+        max_length=MAX_FEDERATED_COLLECTIONS
+    )
+    fusion: Literal["rrf", "normalized"] = Field(
+        default=FEDERATED_FUSION,
+        description="Способ объединения результатов из нескольких коллекций: rrf или нормализация оценок"
+    )
 
 
 class SearchRequestMCP(BaseModel):
@@ -67,11 +116,49 @@ class SearchRequestMCP(BaseModel):
     )
 
 
+class RelatedObjectsRequest(BaseModel):
+    """Модель запроса связанных объектов конфигурации 1С"""
+    object_name: str = Field(
+        description="Имя объекта конфигурации 1С, например 'Документ.РеализацияТоваровУслуг' или 'РеализацияТоваровУслуг'",
+        min_length=1,
+        max_length=500
+    )
+    depth: int = Field(
+        default=1,
+        description=f"Глубина обхода связей: 1 — только соседи, до {MAX_GRAPH_DEPTH} — подграф",
+        ge=1,
+        le=MAX_GRAPH_DEPTH
+    )
+    direction: Literal["out", "in", "both"] = Field(
+        default="both",
+        description="Направление связей: out — на какие объекты ссылается, in — какие объекты ссылаются на него, both — оба"
+    )
+
+
 def get_query_embedding(query: str) -> List[float]:
     """Получение эмбеддинга для запроса"""
+    global local_embedder, _local_embedding_failures
+    embedder = local_embedder
+    if embedder is not None:
+        try:
+            embedding = embedder.embed_query(query)
+            _local_embedding_failures = 0
+            return embedding
+        except Exception as e:
+            # При ошибке локальной модели запрос уходит в сервис эмбеддингов
+            _local_embedding_failures += 1
+            logger.warning(
+                "Ошибка локальной модели эмбеддингов (%d подряд), используется Embedding API: %s",
+                _local_embedding_failures, e)
+            if _local_embedding_failures >= MAX_LOCAL_EMBEDDING_FAILURES:
+                logger.warning(
+                    "Локальная модель эмбеддингов отключена после %d ошибок подряд", _local_embedding_failures)
+                local_embedder = None
+
     payload = json.dumps({
         "texts": [query],
-        "task": "retrieval.query"
+        "task": "retrieval.query",
+        "priority": "interactive"
     })
     headers = {'Content-Type': 'application/json'}
     try:
@@ -85,72 +172,416 @@ def get_query_embedding(query: str) -> List[float]:
         raise Exception(f"Ошибка получения эмбеддинга: {str(e)}")
 
 
+def parse_collection_names(value: str | None) -> List[str]:
+    """Разбор списка коллекций из заголовка x-collection-name"""
+    if not value:
+        return [COLLECTION_NAME]
+    names = []
+    for name in value.split(COLLECTION_NAMES_SEPARATOR):
+        name = name.strip()
+        if name and name not in names:
+            names.append(name)
+    return names or [COLLECTION_NAME]
+
+
+def resolve_collection_name(collection_name: str) -> str:
+    """Текущая версия коллекции за алиасом — ключ кэша графа (поиск передаёт алиас в Qdrant как есть)"""
+    # Без кэша: loader может переключить алиас в любой момент
+    for alias in qdrant_client.get_aliases().aliases:
+        if alias.alias_name == collection_name:
+            return alias.collection_name
+    return collection_name
+
+
+def is_sectioned_collection(collection_name: str, refresh: bool = False) -> bool:
+    """Проверка, загружена ли коллекция в режиме разделов (есть вектор содержимого)"""
+    cached = _sectioned_collections.get(collection_name)
+    if not refresh and cached and time.monotonic() - cached[1] < COLLECTION_INFO_TTL:
+        return cached[0]
+
+    vectors = qdrant_client.get_collection(
+        collection_name).config.params.vectors
+    sectioned = isinstance(vectors, dict) and CONTENT_VECTOR in vectors
+    _sectioned_collections[collection_name] = (sectioned, time.monotonic())
+    return sectioned
+
+
+def resolve_local_index_path(collection_name: str) -> str | None:
+    """Путь к текущей версии локального индекса (имя коллекции — ссылка на версию), None для недопустимого имени"""
+    # Имя приходит из заголовка x-collection-name: выход за пределы LOCAL_INDEX_DIR запрещён
+    if (not collection_name or collection_name in (".", "..") or os.path.isabs(collection_name)
+            or "/" in collection_name or os.sep in collection_name
+            or (os.altsep and os.altsep in collection_name)):
+        return None
+    base_dir = os.path.realpath(LOCAL_INDEX_DIR)
+    path = os.path.realpath(os.path.join(base_dir, collection_name))
+    if os.path.dirname(path) != base_dir:
+        return None
+    return path
+
+
+def get_local_index(collection_name: str) -> LocalIndex | None:
+    """Локальный индекс коллекции, None если его нет"""
+    path = resolve_local_index_path(collection_name)
+    if path is None:
+        return None
+    index = _local_indexes.get(path)
+    if index is not None:
+        return index
+    if not os.path.isfile(os.path.join(path, "manifest.json")):
+        return None
+
+    with _local_indexes_lock:
+        index = _local_indexes.get(path)
+        if index is None:
+            # Loader переключает ссылку на новую версию — старые версии вытесняются из кэша
+            if len(_local_indexes) >= MAX_CACHED_LOCAL_INDEXES:
+                _local_indexes.pop(next(iter(_local_indexes)))
+            index = LocalIndex(path)
+            _local_indexes[path] = index
+        return index
+
+
+def search_local(query_embedding: List[float], collection_name: str, object_type: str = None, limit: int = DEFAULT_SEARCH_LIMIT, use_multivector: bool = True) -> List[Dict[str, Any]]:
+    """Поиск по локальному индексу: те же векторы, фильтр и RRF, что и в Qdrant"""
+    index = get_local_index(collection_name)
+    query = np.asarray(query_embedding, dtype=np.float32)
+    mask = index.type_mask(object_type)
+
+    if use_multivector:
+        prefetch_limit = limit * PREFETCH_LIMIT_MULTIPLIER
+        hits = rrf_fuse([
+            index.search(OBJECT_NAME_VECTOR, query, prefetch_limit, mask, LOCAL_IVF_NPROBE),
+            index.search(FRIENDLY_NAME_VECTOR, query, prefetch_limit, mask, LOCAL_IVF_NPROBE)
+        ], limit, LOCAL_RRF_K)
+    else:
+        hits = index.search(FRIENDLY_NAME_VECTOR, query,
+                            limit, mask, LOCAL_IVF_NPROBE)
+
+    results = []
+    for row, score in hits:
+        payload = index.payload(row)
+        results.append({
+            "score": score,
+            "collection": collection_name,
+            "object_name": payload.get("object_name", ""),
+            "object_type": payload.get("object_type", ""),
+            "description": payload.get("doc", "")
+        })
+    return results
+
+
+def search_sections(query_embedding: List[float], collection_name: str, query_filter: Filter = None, limit: int = DEFAULT_SEARCH_LIMIT, use_multivector: bool = True) -> List[Dict[str, Any]]:
+    """Поиск по коллекции с разделами: объекты группируются, возвращаются только найденные разделы"""
+    prefetch_limit = limit * PREFETCH_LIMIT_MULTIPLIER
+    # Векторы имён есть только у объектов, вектор содержимого — только у разделов
+    prefetch = [
+        Prefetch(
+            query=query_embedding,
+            using=CONTENT_VECTOR,
+            filter=query_filter,
+            limit=prefetch_limit * SECTION_GROUP_SIZE
+        ),
+        Prefetch(
+            query=query_embedding,
+            using=FRIENDLY_NAME_VECTOR,
+            filter=query_filter,
+            limit=prefetch_limit
+        ),
+    ]
+    if use_multivector:
+        prefetch.append(Prefetch(
+            query=query_embedding,
+            using=OBJECT_NAME_VECTOR,
+            filter=query_filter,
+            limit=prefetch_limit
+        ))
+
+    # Объект и его разделы имеют общий parent_id, поэтому группы = объекты
+    search_results = qdrant_client.query_points_groups(
+        collection_name=collection_name,
+        prefetch=prefetch,
+        query=FusionQuery(fusion=Fusion.RRF),
+        group_by="parent_id",
+        group_size=SECTION_GROUP_SIZE + 1,
+        limit=limit
+    )
+
+    results = []
+    for group in search_results.groups:
+        hits = group.hits
+        sections = [
+            hit for hit in hits if hit.payload.get("point_type") == "section"]
+        objects = [
+            hit for hit in hits if hit.payload.get("point_type") != "section"]
+        if sections:
+            sections = sorted(
+                sections[:SECTION_GROUP_SIZE], key=lambda hit: hit.payload.get("section_index", 0))
+            description = "\n\n".join(
+                hit.payload.get("doc", "") for hit in sections)
+        else:
+            # Объект найден только по имени: отдаём оглавление разделов
+            titles = objects[0].payload.get("sections", []) if objects else []
+            description = "Разделы: " + ", ".join(titles)
+
+        payload = hits[0].payload
+        results.append({
+            "score": hits[0].score,
+            "collection": collection_name,
+            "object_name": payload.get("object_name", ""),
+            "object_type": payload.get("object_type", ""),
+            "description": description,
+            "sections": [hit.payload.get("section_title", "") for hit in sections]
+        })
+
+    return results
+
+
+def search_collection(query_embedding: List[float], collection_name: str, object_type: str = None, limit: int = DEFAULT_SEARCH_LIMIT, use_multivector: bool = True) -> List[Dict[str, Any]]:
+    """Поиск в одной коллекции по готовому эмбеддингу запроса"""
+    if SEARCH_BACKEND == "local":
+        return search_local(query_embedding, collection_name, object_type, limit, use_multivector)
+
+    # Имя может быть алиасом: Qdrant разрешает его сам, поэтому переключение версии видно сразу.
+    # Признак разделов кэшируется и после переключения может устареть — тогда он перепроверяется
+    sectioned = is_sectioned_collection(collection_name)
+    try:
+        results = search_qdrant(
+            query_embedding, collection_name, sectioned, object_type, limit, use_multivector)
+    except Exception:
+        if is_sectioned_collection(collection_name, refresh=True) == sectioned:
+            raise
+        sectioned = not sectioned
+        results = search_qdrant(
+            query_embedding, collection_name, sectioned, object_type, limit, use_multivector)
+
+    # Объекты с point_type есть только в коллекциях с разделами
+    if not sectioned and any(result.get("point_type") for result in results) \
+            and is_sectioned_collection(collection_name, refresh=True):
+        results = search_qdrant(
+            query_embedding, collection_name, True, object_type, limit, use_multivector)
+
+    for result in results:
+        result.pop("point_type", None)
+    return results
+
+
+def search_qdrant(query_embedding: List[float], collection_name: str, sectioned: bool, object_type: str = None, limit: int = DEFAULT_SEARCH_LIMIT, use_multivector: bool = True) -> List[Dict[str, Any]]:
+    """Поиск в коллекции Qdrant в заданном режиме (по разделам или по объектам)"""
+    # Подготовка фильтра по типу объекта
+    query_filter = None
+    if object_type:
+        query_filter = Filter(
+            must=[
+                {
+                    "key": "object_type",
+                    "match": {
+                        "value": object_type
+                    }
+                }
+            ]
+        )
+
+    if sectioned:
+        return search_sections(
+            query_embedding, collection_name, query_filter, limit, use_multivector)
+
+    if use_multivector:
+        # Мультивекторный поиск с RRF
+        search_results = qdrant_client.query_points(
+            collection_name=collection_name,
+            prefetch=[
+                Prefetch(
+                    query=query_embedding,
+                    using=OBJECT_NAME_VECTOR,
+                    filter=query_filter,
+                    limit=limit * PREFETCH_LIMIT_MULTIPLIER
+                ),
+                Prefetch(
+                    query=query_embedding,
+                    using=FRIENDLY_NAME_VECTOR,
+                    filter=query_filter,
+                    limit=limit * PREFETCH_LIMIT_MULTIPLIER
+                ),
+            ],
+            query=FusionQuery(fusion=Fusion.RRF),
+            limit=limit
+        )
+    else:
+        # Обычный поиск по одному вектору
+        search_results = qdrant_client.query_points(
+            collection_name=collection_name,
+            query=query_embedding,
+            using=FRIENDLY_NAME_VECTOR,  # Используем friendly_name как основной вектор
+            query_filter=query_filter,
+            limit=limit
+        )
+
+    # Форматирование результатов
+    results = []
+    for result in search_results.points:
+        results.append({
+            "score": result.score,
+            "collection": collection_name,
+            "object_name": result.payload.get("object_name", ""),
+            "object_type": result.payload.get("object_type", ""),
+            "description": result.payload.get("doc", ""),
+            "point_type": result.payload.get("point_type")
+        })
+
+    return results
+
+
+def fuse_results(results_by_collection: List[List[Dict[str, Any]]], limit: int, fusion: str = FEDERATED_FUSION) -> List[Dict[str, Any]]:
+    """Объединение результатов нескольких коллекций через RRF или нормализацию оценок"""
+    fused = []
+    for results in results_by_collection:
+        if not results:
+            continue
+        if fusion == "normalized":
+            # Min-max нормализация: оценки разных коллекций приводятся к [0, 1]
+            scores = [result["score"] for result in results]
+            low, high = min(scores), max(scores)
+            for result in results:
+                score = (result["score"] - low) / \
+                    (high - low) if high > low else 1.0
+                fused.append({**result, "score": score})
+        else:
+            # RRF: учитывается только позиция результата в своей коллекции
+            for rank, result in enumerate(results, 1):
+                fused.append(
+                    {**result, "score": 1.0 / (FEDERATED_RRF_K + rank)})
+
+    fused.sort(key=lambda result: result["score"], reverse=True)
+    return fused[:limit]
+
+
 def rag_search(query: str, collection_name: str, object_type: str = None, limit: int = DEFAULT_SEARCH_LIMIT, use_multivector: bool = True) -> List[Dict[str, Any]]:
     """Выполнение RAG-поиска в документации 1С с поддержкой мультивекторного поиска"""
     try:
         # Получение эмбеддинга для запроса
         query_embedding = get_query_embedding(query)
 
-        # Подготовка фильтра по типу объекта
-        query_filter = None
-        if object_type:
-            query_filter = Filter(
-                must=[
-                    {
-                        "key": "object_type",
-                        "match": {
-                            "value": object_type
-                        }
-                    }
-                ]
-            )
+        return search_collection(query_embedding, collection_name, object_type, limit, use_multivector)
+    except Exception as e:
+        raise Exception(f"Ошибка поиска в документации: {str(e)}")
 
-        if use_multivector:
-            # Мультивекторный поиск с RRF
-            search_results = qdrant_client.query_points(
-                collection_name=collection_name,
-                prefetch=[
-                    Prefetch(
-                        query=query_embedding,
-                        using=OBJECT_NAME_VECTOR,
-                        filter=query_filter,
-                        limit=limit * PREFETCH_LIMIT_MULTIPLIER
-                    ),
-                    Prefetch(
-                        query=query_embedding,
-                        using=FRIENDLY_NAME_VECTOR,
-                        filter=query_filter,
-                        limit=limit * PREFETCH_LIMIT_MULTIPLIER
-                    ),
-                ],
-                query=FusionQuery(fusion=Fusion.RRF),
-                limit=limit
-            )
-        else:
-            # Обычный поиск по одному вектору
-            search_results = qdrant_client.query_points(
-                collection_name=collection_name,
-                query=query_embedding,
-                using=FRIENDLY_NAME_VECTOR,  # Используем friendly_name как основной вектор
-                query_filter=query_filter,
-                limit=limit
-            )
 
-        # Форматирование результатов
-        results = []
-        for result in search_results.points:
-            results.append({
-                "score": result.score,
-                "object_name": result.payload.get("object_name", ""),
-                "object_type": result.payload.get("object_type", ""),
-                "description": result.payload.get("doc", "")
-            })
-
-        return results
+def federated_rag_search(query: str, collection_names: List[str], object_type: str = None, limit: int = DEFAULT_SEARCH_LIMIT, use_multivector: bool = True, fusion: str = FEDERATED_FUSION) -> List[Dict[str, Any]]:
+    """Федеративный RAG-поиск: один эмбеддинг запроса, параллельный поиск по всем коллекциям"""
+    if len(collection_names) == 1:
+        return rag_search(query, collection_names[0], object_type, limit, use_multivector)
+
+    try:
+        # Эмбеддинг запроса вычисляется один раз для всех коллекций
+        query_embedding = get_query_embedding(query)
+
+        with ThreadPoolExecutor(max_workers=len(collection_names)) as executor:
+            results_by_collection = list(executor.map(
+                lambda name: search_collection(
+                    query_embedding, name, object_type, limit, use_multivector),
+                collection_names
+            ))
+
+        return fuse_results(results_by_collection, limit, fusion)
     except Exception as e:
         raise Exception(f"Ошибка поиска в документации: {str(e)}")
 
 
+def find_missing_collections(collection_names: List[str]) -> List[str]:
+    """Список коллекций, которых нет в Qdrant или в локальном индексе (имя может быть алиасом)"""
+    if SEARCH_BACKEND == "local":
+        return [name for name in collection_names if get_local_index(name) is None]
+
+    return [name for name in collection_names if not qdrant_client.collection_exists(name)]
+
+
+def get_reference_graph(collection_name: str) -> ReferenceGraph:
+    """Граф ссылок коллекции (строится один раз на версию коллекции)"""
+    if SEARCH_BACKEND == "local":
+        resolved_name = resolve_local_index_path(collection_name)
+        if resolved_name is None:
+            raise ValueError(f"Недопустимое имя коллекции '{collection_name}'")
+    else:
+        resolved_name = resolve_collection_name(collection_name)
+    graph = _reference_graphs.get(resolved_name)
+    if graph is not None:
+        return graph
+
+    with _reference_graphs_lock:
+        graph = _reference_graphs.get(resolved_name)
+        if graph is not None:
+            return graph
+
+        if SEARCH_BACKEND == "local":
+            graph = ReferenceGraph.from_payloads(
+                get_local_index(collection_name).iter_payloads())
+            return _cache_reference_graph(resolved_name, graph)
+
+        # Только объекты: разделы и манифест сборки в граф не входят
+        objects_filter = Filter(must_not=[FieldCondition(
+            key="point_type", match=MatchAny(any=["section", "manifest"]))])
+        payloads = []
+        offset = None
+        while True:
+            points, offset = qdrant_client.scroll(
+                collection_name=resolved_name,
+                scroll_filter=objects_filter,
+                limit=GRAPH_SCROLL_BATCH_SIZE,
+                offset=offset,
+                with_payload=["object_key", "object_name",
+                              "object_type", "friendly_name", "references"],
+                with_vectors=False
+            )
+            payloads.extend(point.payload for point in points)
+            if offset is None:
+                break
+
+        graph = ReferenceGraph.from_payloads(payloads)
+        return _cache_reference_graph(resolved_name, graph)
+
+
+def _cache_reference_graph(resolved_name: str, graph: ReferenceGraph) -> ReferenceGraph:
+    if len(_reference_graphs) >= MAX_CACHED_GRAPHS:
+        _reference_graphs.pop(next(iter(_reference_graphs)))
+    _reference_graphs[resolved_name] = graph
+    return graph
+
+
+def find_related_objects(collection_name: str, object_name: str, depth: int = 1, direction: str = "both") -> List[Dict[str, Any]]:
+    """Подграфы связей для объектов с указанным именем"""
+    graph = get_reference_graph(collection_name)
+    return [
+        {"collection": collection_name, **graph.subgraph(key, depth, direction, MAX_GRAPH_NODES)}
+        for key in graph.find(object_name)
+    ]
+
+
+def format_subgraph(subgraph: Dict[str, Any]) -> List[str]:
+    """Текстовое представление подграфа для MCP-ответа"""
+    nodes = {node["key"]: node for node in subgraph["nodes"]}
+    root = nodes[subgraph["root"]]
+    lines = [f"\nОбъект: {root['key']}" +
+             (f" ({root['friendly_name']})" if root.get("friendly_name") else "")]
+
+    for level in sorted({edge["level"] for edge in subgraph["edges"]}):
+        lines.append(f"Уровень {level}:")
+        for edge in subgraph["edges"]:
+            if edge["level"] != level:
+                continue
+            target = nodes.get(edge["target"], {})
+            missing = "" if target.get("in_collection", True) else " (нет в коллекции)"
+            lines.append(f"  {edge['source']} → {edge['target']}{missing}")
+
+    if not subgraph["edges"]:
+        lines.append("Связей не найдено")
+    if subgraph["truncated"]:
+        lines.append(
+            f"Показаны не все связи: подграф ограничен {MAX_GRAPH_NODES} объектами")
+    lines.append("---")
+    return lines
+
+
 @mcp.tool
 def search_1c_documentation(search_params: SearchRequestMCP) -> str:
     """Поиск описания объектов конфигурации 1С Предприятие 8 в документации.
@@ -161,22 +592,24 @@ def search_1c_documentation(search_params: SearchRequestMCP) -> str:
     try:
 
         headers = get_http_headers()
-        # Определяем имя коллекции по приоритету:
-        # 1. Из HTTP-заголовка x-collection-name
+        # Определяем имена коллекций по приоритету:
+        # 1. Из HTTP-заголовка x-collection-name (можно несколько через запятую)
         # 2. Значение по умолчанию из конфигурации
-        collection_name = (
-            headers.get("x-collection-name") or
-            COLLECTION_NAME
-        )
+        collection_names = parse_collection_names(
+            headers.get("x-collection-name"))
+        if len(collection_names) > MAX_FEDERATED_COLLECTIONS:
+            return f"Ошибка: в одном запросе допускается не более {MAX_FEDERATED_COLLECTIONS} коллекций."
+        collection_name = ", ".join(collection_names)
 
-        # Проверяем, что коллекция существует
-        if not qdrant_client.collection_exists(collection_name):
-            return f"Ошибка: коллекция '{collection_name}' не существует в Qdrant."
+        # Проверяем, что коллекции существуют
+        missing_collections = find_missing_collections(collection_names)
+        if missing_collections:
+            return f"Ошибка: коллекция '{', '.join(missing_collections)}' не существует в {SEARCH_BACKEND_LOCATION}."
 
         use_multivector = True
-        results = rag_search(
+        results = federated_rag_search(
             search_params.query,
-            collection_name,
+            collection_names,
             search_params.object_type,
             search_params.limit,
             use_multivector
@@ -196,8 +629,14 @@ def search_1c_documentation(search_params: SearchRequestMCP) -> str:
         for i, result in enumerate(results, 1):
             formatted_results.append(
                 f"\nРезультат {i} (релевантность: {result['score']:.3f})")
+            if len(collection_names) > 1:
+                formatted_results.append(
+                    f"Коллекция: {result['collection']}")
             formatted_results.append(f"Объект: {result['object_name']}")
             formatted_results.append(f"Тип: {result['object_type']}")
+            if result.get("sections"):
+                formatted_results.append(
+                    f"Разделы: {', '.join(result['sections'])}")
             formatted_results.append(f"Описание:")
             formatted_results.append(f"{result['description']}")
             formatted_results.append("---")
@@ -208,6 +647,48 @@ def search_1c_documentation(search_params: SearchRequestMCP) -> str:
         return f"Ошибка при поиске в документации 1С: {str(e)}"
 
 
+@mcp.tool
+def get_related_1c_objects(related_params: RelatedObjectsRequest) -> str:
+    """Связи объекта конфигурации 1С по ссылочным типам реквизитов и регистрам: соседи или подграф на несколько шагов.
+
+    Используйте, чтобы пройти по цепочке документ → справочник → регистр одним вызовом вместо нескольких поисков.
+
+    Args:
+        related_params: Имя объекта, глубина обхода и направление связей
+    """
+    try:
+        headers = get_http_headers()
+        collection_names = parse_collection_names(
+            headers.get("x-collection-name"))
+        if len(collection_names) > MAX_FEDERATED_COLLECTIONS:
+            return f"Ошибка: в одном запросе допускается не более {MAX_FEDERATED_COLLECTIONS} коллекций."
+
+        missing_collections = find_missing_collections(collection_names)
+        if missing_collections:
+            return f"Ошибка: коллекция '{', '.join(missing_collections)}' не существует в {SEARCH_BACKEND_LOCATION}."
+
+        formatted_results = [
+            f"Связи объекта '{related_params.object_name}' (глубина: {related_params.depth}, направление: {related_params.direction})"]
+        found = False
+        for collection_name in collection_names:
+            subgraphs = find_related_objects(
+                collection_name, related_params.object_name, related_params.depth, related_params.direction)
+            for subgraph in subgraphs:
+                found = True
+                if len(collection_names) > 1:
+                    formatted_results.append(
+                        f"\nКоллекция: {collection_name}")
+                formatted_results.extend(format_subgraph(subgraph))
+
+        if not found:
+            return f"Объект '{related_params.object_name}' не найден в графе ссылок (коллекция: {', '.join(collection_names)}). Для коллекций, загруженных до появления графа, требуется перезагрузка."
+
+        return "\n".join(formatted_results)
+
+    except Exception as e:
+        return f"Ошибка при получении связей объекта 1С: {str(e)}"
+
+
 @mcp.custom_route("/", methods=["GET"])
 async def root(request: Request) -> JSONResponse:
     return JSONResponse({"message": "MCP 1C RAG Server запущен"})
@@ -217,9 +698,12 @@ async def root(request: Request) -> JSONResponse:
 async def health_check(request: Request) -> JSONResponse:
     """Проверка работоспособности сервера и подключений"""
     try:
-        # Проверяем подключение к Qdrant
-        collections = qdrant_client.get_collections()
-        qdrant_status = "OK"
+        # Проверяем подключение к Qdrant (не используется при локальном индексе)
+        if SEARCH_BACKEND == "local":
+            qdrant_status = "NOT USED"
+        else:
+            collections = qdrant_client.get_collections()
+            qdrant_status = "OK"
 
         # Проверяем сервис эмбеддингов
         embedding_status = "OK"
@@ -235,6 +719,8 @@ async def health_check(request: Request) -> JSONResponse:
             "status": "healthy",
             "qdrant": qdrant_status,
             "embedding_service": embedding_status,
+            "query_embedding": f"local ({local_embedder.model_name})" if local_embedder else "remote",
+            "search_backend": SEARCH_BACKEND,
             "collection": COLLECTION_NAME
         })
     except Exception as e:
@@ -253,33 +739,44 @@ async def manual_search(request: Request) -> JSONResponse:
         # Валидация данных через Pydantic модель
         search_request = SearchRequest(**req_data)
 
-        # Определяем имя коллекции по приоритету:
-        # 1. Из HTTP-заголовка x-collection-name
-        # 2. Значение по умолчанию из конфигурации
-        collection_name = (
-            request.headers.get("x-collection-name") or
-            COLLECTION_NAME
-        )
+        # Определяем имена коллекций по приоритету:
+        # 1. Из поля collections в теле запроса
+        # 2. Из HTTP-заголовка x-collection-name (можно несколько через запятую)
+        # 3. Значение по умолчанию из конфигурации
+        if search_request.collections:
+            collection_names = parse_collection_names(
+                COLLECTION_NAMES_SEPARATOR.join(search_request.collections))
+        else:
+            collection_names = parse_collection_names(
+                request.headers.get("x-collection-name"))
+        if len(collection_names) > MAX_FEDERATED_COLLECTIONS:
+            return JSONResponse({
+                "error": f"В одном запросе допускается не более {MAX_FEDERATED_COLLECTIONS} коллекций."
+            }, status_code=400)
 
-        # Проверяем, что коллекция существует
-        if not qdrant_client.collection_exists(collection_name):
+        # Проверяем, что коллекции существуют
+        missing_collections = find_missing_collections(collection_names)
+        if missing_collections:
             return JSONResponse({
-                "error": f"Коллекция '{collection_name}' не существует в Qdrant."
+                "error": f"Коллекция '{', '.join(missing_collections)}' не существует в {SEARCH_BACKEND_LOCATION}."
             }, status_code=400)
 
         # Выполнение поиска
-        results = rag_search(
+        results = federated_rag_search(
             query=search_request.query,
-            collection_name=collection_name,
+            collection_names=collection_names,
             object_type=search_request.object_type,
             limit=search_request.limit,
-            use_multivector=search_request.use_multivector
+            use_multivector=search_request.use_multivector,
+            fusion=search_request.fusion
         )
 
         return JSONResponse({
             "query": search_request.query,
             "object_type": search_request.object_type,
-            "collection_name": collection_name,
+            "collection_name": ", ".join(collection_names),
+            "collections": collection_names,
+            "fusion": search_request.fusion if len(collection_names) > 1 else None,
             "limit": search_request.limit,
             "use_multivector": search_request.use_multivector,
             "results_count": len(results),
@@ -297,6 +794,49 @@ async def manual_search(request: Request) -> JSONResponse:
         }, status_code=500)
 
 
+@mcp.custom_route("/related", methods=["POST"])
+async def manual_related(request: Request) -> JSONResponse:
+    """REST endpoint для ручного тестирования графа ссылок"""
+    try:
+        req_data = await request.json()
+        related_request = RelatedObjectsRequest(**req_data)
+
+        collection_names = parse_collection_names(
+            request.headers.get("x-collection-name"))
+        if len(collection_names) > MAX_FEDERATED_COLLECTIONS:
+            return JSONResponse({
+                "error": f"В одном запросе допускается не более {MAX_FEDERATED_COLLECTIONS} коллекций."
+            }, status_code=400)
+
+        missing_collections = find_missing_collections(collection_names)
+        if missing_collections:
+            return JSONResponse({
+                "error": f"Коллекция '{', '.join(missing_collections)}' не существует в {SEARCH_BACKEND_LOCATION}."
+            }, status_code=400)
+
+        results = []
+        for collection_name in collection_names:
+            results.extend(find_related_objects(
+                collection_name, related_request.object_name, related_request.depth, related_request.direction))
+
+        return JSONResponse({
+            "object_name": related_request.object_name,
+            "depth": related_request.depth,
+            "direction": related_request.direction,
+            "collections": collection_names,
+            "results": results
+        })
+
+    except ValueError as e:
+        return JSONResponse({
+            "error": f"Ошибка валидации данных: {str(e)}"
+        }, status_code=400)
+    except Exception as e:
+        return JSONResponse({
+            "error": f"Ошибка получения связей: {str(e)}"
+        }, status_code=500)
+
+
 if __name__ == "__main__":
     mcp.run(transport="streamable-http", host=SERVER_HOST,
             port=SERVER_PORT, log_level="info")
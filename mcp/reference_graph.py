@@ -0,0 +1,97 @@
+# Граф ссылок между объектами конфигурации 1С
+#
+# Loader сохраняет в payload каждого объекта его ключ (object_key, вида Тип.Имя)
+# и список объектов, на которые он ссылается (references). Граф строится в памяти
+# один раз на версию коллекции и отвечает на запросы о связях без эмбеддингов и векторного поиска.
+from collections import deque
+from typing import Dict, Any, Iterable, List, Set
+
+
+class ReferenceGraph:
+    """Индекс смежности объектов: исходящие ссылки и обратные"""
+
+    def __init__(self):
+        self.nodes: Dict[str, Dict[str, Any]] = {}
+        self.outgoing: Dict[str, Set[str]] = {}
+        self.incoming: Dict[str, Set[str]] = {}
+        # Имя без типа -> ключи (для поиска по "Номенклатура" без "Справочник.")
+        self._by_name: Dict[str, List[str]] = {}
+        self._by_key: Dict[str, str] = {}
+
+    @classmethod
+    def from_payloads(cls, payloads: Iterable[Dict[str, Any]]) -> "ReferenceGraph":
+        """Построение графа по payload объектов коллекции"""
+        graph = cls()
+        for payload in payloads:
+            key = payload.get("object_key")
+            if not key:
+                continue
+            graph.nodes[key] = {
+                "object_name": payload.get("object_name", ""),
+                "object_type": payload.get("object_type", ""),
+                "friendly_name": payload.get("friendly_name", "")
+            }
+            for reference in payload.get("references") or []:
+                graph.outgoing.setdefault(key, set()).add(reference)
+                graph.incoming.setdefault(reference, set()).add(key)
+
+        for key in set(graph.nodes) | set(graph.incoming):
+            graph._by_key[key.lower()] = key
+            graph._by_name.setdefault(
+                key.split(".", 1)[-1].lower(), []).append(key)
+        return graph
+
+    @property
+    def edges_count(self) -> int:
+        return sum(len(references) for references in self.outgoing.values())
+
+    def find(self, name: str) -> List[str]:
+        """Ключи объектов по полному имени (Тип.Имя) или по имени без типа"""
+        lowered = name.strip().lower()
+        if lowered in self._by_key:
+            return [self._by_key[lowered]]
+        return sorted(self._by_name.get(lowered.split(".", 1)[-1], []))
+
+    def neighbors(self, key: str, direction: str = "both") -> List[tuple]:
+        """Соседи объекта: (ключ, направление связи) — out: объект ссылается, in: ссылаются на объект"""
+        result = []
+        if direction in ("out", "both"):
+            result.extend((neighbor, "out")
+                          for neighbor in sorted(self.outgoing.get(key, ())))
+        if direction in ("in", "both"):
+            result.extend((neighbor, "in")
+                          for neighbor in sorted(self.incoming.get(key, ())))
+        return result
+
+    def subgraph(self, key: str, depth: int = 1, direction: str = "both", max_nodes: int = 200) -> Dict[str, Any]:
+        """Подграф на k шагов от объекта (обход в ширину)"""
+        levels: Dict[str, int] = {key: 0}
+        edges = []
+        seen_edges = set()
+        truncated = False
+        queue = deque([key])
+
+        while queue:
+            current = queue.popleft()
+            if levels[current] >= depth:
+                continue
+            for neighbor, edge_direction in self.neighbors(current, direction):
+                source, target = (current, neighbor) if edge_direction == "out" else (
+                    neighbor, current)
+                if neighbor not in levels:
+                    if len(levels) >= max_nodes:
+                        truncated = True
+                        continue
+                    levels[neighbor] = levels[current] + 1
+                    queue.append(neighbor)
+                if (source, target) not in seen_edges:
+                    seen_edges.add((source, target))
+                    edges.append({"source": source, "target": target,
+                                  "level": levels[current] + 1})
+
+        nodes = [
+            {"key": node, "level": level, "in_collection": node in self.nodes,
+             **self.nodes.get(node, {})}
+            for node, level in sorted(levels.items(), key=lambda item: (item[1], item[0]))
+        ]
+        return {"root": key, "nodes": nodes, "edges": edges, "truncated": truncated}
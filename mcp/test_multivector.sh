@@ -49,7 +49,28 @@ curl -X POST http://localhost:9000/search \
   }' | jq .
 
 echo
-echo "5. Проверка health check:"
+echo "5. Федеративный поиск по нескольким коллекциям:"
+curl -X POST http://localhost:9000/search \
+  -H "Content-Type: application/json" \
+  -H "x-collection-name: 1c_rag,custom_collection" \
+  -d '{
+    "query": "справочник номенклатура",
+    "limit": 5,
+    "use_multivector": true
+  }' | jq .
+
+echo
+echo "6. Связи объекта (граф ссылок):"
+curl -X POST http://localhost:9000/related \
+  -H "Content-Type: application/json" \
+  -d '{
+    "object_name": "Документ.РеализацияТоваровУслуг",
+    "depth": 2,
+    "direction": "out"
+  }' | jq .
+
+echo
+echo "7. Проверка health check:"
 curl -X GET http://localhost:9000/health | jq .
 
 echo